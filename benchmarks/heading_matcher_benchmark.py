@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Heading Matcher Benchmark
+Compares the per-pattern heading search and section scan with the compiled matcher and section index
+on synthetic layouts
+"""
+
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add the backend directory to the Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from services.heading_matcher import patterns, is_eligibility_heading, find_eligibility_section
+
+FILLER_WORDS = (
+    "the bidder shall submit tender documents along with earnest money deposit as per terms "
+    "and conditions of contract including delivery schedule warranty payment penalty clause "
+    "inspection of goods at consignee site within stipulated period"
+).split()
+PLAIN_HEADINGS = [
+    "Instructions to Bidders", "Scope of Work", "Terms and Conditions", "Payment Terms",
+    "Delivery Schedule", "Warranty", "Annexure", "Price Bid", "General Conditions of Contract"
+]
+
+
+def legacy_is_eligibility_heading(text):
+    for pat in patterns:
+        if re.search(pat, text, re.IGNORECASE):
+            return True
+    return False
+
+
+def legacy_extract_section(paragraphs):
+    """The section scan as it was before the section index: headings are rescanned for every hit"""
+    headings = [(i, p) for i, p in enumerate(paragraphs) if p["role"] in ("title", "sectionHeading")]
+
+    for idx, (para_idx, para) in enumerate(headings):
+        if legacy_is_eligibility_heading(para["content"]):
+            end_idx = headings[idx + 1][0] if idx + 1 < len(headings) else len(paragraphs)
+            return "\n".join(p["content"].strip() for p in paragraphs[para_idx + 1:end_idx])
+
+    for i, p in enumerate(paragraphs):
+        if legacy_is_eligibility_heading(p["content"]):
+            next_heading = next((h[0] for h in headings if h[0] > i), len(paragraphs))
+            return "\n".join(q["content"].strip() for q in paragraphs[i + 1:next_heading])
+
+    return ""
+
+
+def indexed_extract_section(paragraphs):
+    section = find_eligibility_section(paragraphs)
+    if section is None:
+        return ""
+    return "\n".join(p["content"].strip() for p in paragraphs[section.start:section.end])
+
+
+def synthetic_layout(size: int, seed: int, with_eligibility_heading: bool):
+    """size paragraphs: ~8% headings, the eligibility heading (if any) two thirds of the way in"""
+    rng = random.Random(seed)
+    paragraphs = []
+    for position in range(size):
+        if rng.random() < 0.08:
+            paragraphs.append({"content": f"{position}. {rng.choice(PLAIN_HEADINGS)}", "role": "sectionHeading"})
+        else:
+            paragraphs.append({"content": " ".join(rng.choices(FILLER_WORDS, k=rng.randint(10, 40))), "role": None})
+    if with_eligibility_heading:
+        paragraphs[size * 2 // 3] = {"content": "7. Pre-Qualification Criteria", "role": "sectionHeading"}
+    return paragraphs
+
+
+def best_of(fn, arg, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print(f"⏱️ Heading matcher benchmark ({size} paragraphs, best of {repeat})\n")
+    for label, with_heading in (("heading present", True), ("no heading (full fallback scan)", False)):
+        paragraphs = synthetic_layout(size, seed=42, with_eligibility_heading=with_heading)
+        assert legacy_extract_section(paragraphs) == indexed_extract_section(paragraphs)
+        texts = [p["content"] for p in paragraphs]
+
+        legacy_match = best_of(lambda items: [legacy_is_eligibility_heading(t) for t in items], texts, repeat)
+        compiled_match = best_of(lambda items: [is_eligibility_heading(t) for t in items], texts, repeat)
+        legacy_section = best_of(legacy_extract_section, paragraphs, repeat)
+        indexed_section = best_of(indexed_extract_section, paragraphs, repeat)
+
+        print(f"📄 Layout with {label}")
+        print(f"   Match every paragraph: {legacy_match * 1000:8.2f} ms -> {compiled_match * 1000:8.2f} ms "
+              f"({legacy_match / compiled_match:.1f}x)")
+        print(f"   Extract section:       {legacy_section * 1000:8.2f} ms -> {indexed_section * 1000:8.2f} ms "
+              f"({legacy_section / indexed_section:.1f}x)\n")
+
+
+if __name__ == "__main__":
+    main()
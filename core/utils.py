@@ -1,5 +1,7 @@
 from core.database import profiles
 from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Optional
 
 def save_or_update_profile(user_id: str, profile_data: dict):
     """Save or update complete company profile"""
@@ -24,4 +26,65 @@ def mark_profile_submitted(user_id: str):
     profiles.update_one(
         {"user_id": user_id},
         {"$set": {"submitted": True}}
-    )
\ No newline at end of file
+    )
+
+# Deadline formats seen on tender portals; date-only formats close at the end of the day
+DEADLINE_FORMATS = [
+    ("%Y-%m-%d %H:%M:%S", False),
+    ("%Y-%m-%d %H:%M", False),
+    ("%Y-%m-%d", True),
+    ("%d-%m-%Y %H:%M:%S", False),
+    ("%d-%m-%Y %H:%M", False),
+    ("%d-%m-%Y %I:%M %p", False),
+    ("%d-%m-%Y", True),
+    ("%d/%m/%Y %H:%M:%S", False),
+    ("%d/%m/%Y %H:%M", False),
+    ("%d/%m/%Y %I:%M %p", False),
+    ("%d/%m/%Y", True),
+    ("%d.%m.%Y", True),
+    ("%d-%b-%Y %H:%M", False),
+    ("%d-%b-%Y %I:%M %p", False),
+    ("%d-%b-%Y", True),
+    ("%d %b %Y", True),
+    ("%d %B %Y", True),
+    ("%b %d, %Y", True),
+    ("%B %d, %Y", True),
+]
+
+def parse_deadline(value) -> Optional[datetime]:
+    """Parse a free-form tender deadline into a naive UTC datetime, or None if unparseable"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = " ".join(str(value or "").split())
+        if not text:
+            return None
+
+        parsed = None
+        for fmt, date_only in DEADLINE_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            if date_only:
+                parsed = parsed.replace(hour=23, minute=59, second=59)
+            break
+
+        if parsed is None:
+            try:
+                parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+            except ValueError:
+                return None
+
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def open_tenders_query(now: Optional[datetime] = None) -> dict:
+    """Mongo filter for tenders whose deadline has not passed (unknown deadlines stay open)"""
+    return {
+        "$or": [
+            {"deadline_at": {"$gte": now or datetime.utcnow()}},
+            {"deadline_at": None}
+        ]
+    }
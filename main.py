@@ -3,6 +3,11 @@ from fastapi.middleware.cors import CORSMiddleware
 
 # Import routers
 from routers import auth, profile, match, company, docgen, upload
+from services.model_registry import get_model_stats
+from services.embedding_cache import get_embedding_cache_stats
+from services.tender_matcher import get_match_stage_stats
+from services.eligibility_extractor import get_extraction_tier_stats
+from services.eligibility_cache import get_eligibility_cache_stats
 
 app = FastAPI(
     title="Tendorix API", 
@@ -37,4 +42,15 @@ def root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/health/models")
+def model_health():
+    """Memory footprint and load time of the embedding models loaded in this worker, plus embedding cache, matcher and extraction counters"""
+    return {
+        **get_model_stats(),
+        "embedding_cache": get_embedding_cache_stats(),
+        "match_cascade": get_match_stage_stats(),
+        "eligibility_tiers": get_extraction_tier_stats(),
+        "eligibility_parse_cache": get_eligibility_cache_stats()
+    }
\ No newline at end of file
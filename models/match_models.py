@@ -1,19 +1,20 @@
 # models/match_models.py
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 
 class MatchRequest(BaseModel):
     company_profile: dict
     score_threshold: Optional[float] = 70.0
 
 class MatchResult(BaseModel):
+    tender_id: Optional[str] = None
     form_url: str
     title: str
-    reference_number: str
-    location: str
-    business_category: List[str]
-    deadline: str
+    reference_number: Optional[str] = None
+    location: Optional[str] = None
+    business_category: List[str] = []
+    deadline: Optional[str] = None
     matching_score: float
     eligible: bool
     field_scores: Dict[str, float]
-    missing_fields: Dict[str, str]
+    missing_fields: Dict[str, Any]
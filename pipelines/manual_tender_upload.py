@@ -167,6 +167,28 @@ def get_tender_statistics():
     except Exception as e:
         print(f"❌ Error getting statistics: {e}")
 
+def normalize_tender_deadlines(force: bool = False) -> bool:
+    """Parse deadline_at for tenders stored before deadlines were normalized"""
+    try:
+        tender_inserter = TenderInserter()
+        print("📅 Normalizing tender deadlines...")
+        
+        result = tender_inserter.normalize_deadlines(force=force)
+        
+        print(f"✅ Processed: {result['processed']}")
+        print(f"   Parsed: {result['parsed']}")
+        print(f"   Unparseable (kept open): {result['unparsed']}")
+        
+        if 'error' in result:
+            print(f"  ⚠️ Error: {result['error']}")
+            return False
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error normalizing deadlines: {e}")
+        print(traceback.format_exc())
+        return False
+
 def main():
     """Main function for command-line usage"""
     if len(sys.argv) < 2:
@@ -177,10 +199,12 @@ def main():
         print("  upload <json_file>  - Upload tenders from JSON file")
         print("  sample             - Upload sample tenders for testing")
         print("  stats              - Show database statistics")
+        print("  deadlines [--all]  - Parse stored deadlines into deadline_at")
         print("\nExamples:")
         print("  python manual_tender_upload.py upload tenders.json")
         print("  python manual_tender_upload.py sample")
         print("  python manual_tender_upload.py stats")
+        print("  python manual_tender_upload.py deadlines")
         return
     
     command = sys.argv[1].lower()
@@ -203,9 +227,13 @@ def main():
     elif command == "stats":
         get_tender_statistics()
         
+    elif command == "deadlines":
+        success = normalize_tender_deadlines(force="--all" in sys.argv[2:])
+        sys.exit(0 if success else 1)
+        
     else:
         print(f"❌ Unknown command: {command}")
-        print("Available commands: upload, sample, stats")
+        print("Available commands: upload, sample, stats, deadlines")
         sys.exit(1)
 
 if __name__ == "__main__":
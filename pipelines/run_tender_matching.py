@@ -7,17 +7,16 @@ Runs the AI-powered tender matching process for all users
 import sys
 import os
 from pathlib import Path
-from datetime import datetime
 
 # Add the backend directory to the Python path
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
 from core.database import db
-from services.basic_filter import filter_tenders
-from services.tender_matcher import compute_tender_match_score
-from services.eligibility_extractor import extract_eligibility_text_from_url
-from services.eligibility_parser import extract_eligibility_json_general
+from services.match_pipeline import run_match_pipeline
+from services.match_store import match_summary
+from services.eligibility_cache import purge_stale_versions
+from services.eligibility_parser import ELIGIBILITY_PROMPT_VERSION
 import traceback
 
 def run_matching_for_user(user_id: str, threshold: float = 60.0) -> dict:
@@ -33,7 +32,6 @@ def run_matching_for_user(user_id: str, threshold: float = 60.0) -> dict:
     """
     try:
         companies = db["companies"]
-        tenders = db["filtered_tenders"]
         
         # Get user's company profile
         company = companies.find_one({"user_id": user_id})
@@ -46,92 +44,33 @@ def run_matching_for_user(user_id: str, threshold: float = 60.0) -> dict:
         
         print(f"🏢 Processing user: {user_id} - {company.get('companyDetails', {}).get('companyName', 'Unknown')}")
         
-        # Filter tenders based on company profile
-        filtered_tenders = filter_tenders(company)
-        print(f"📋 Found {len(filtered_tenders)} filtered tenders")
+        # Filter, prepare and score tenders; unchanged pairs are served from the matches collection
+        outcome = run_match_pipeline(company, threshold)
+        print(f"📋 Found {outcome['total_filtered']} filtered tenders ({outcome['recomputed']} rescored, {outcome['reused']} reused)")
         
-        if not filtered_tenders:
+        if not outcome["total_filtered"]:
             return {
                 "success": True,
                 "user_id": user_id,
                 "company_name": company.get('companyDetails', {}).get('companyName', 'Unknown'),
                 "total_filtered": 0,
+                "total_matches": 0,
                 "matches": [],
                 "message": "No tenders match company profile"
             }
         
-        matches = []
-        processed = 0
-        
-        for tender in filtered_tenders:
-            try:
-                processed += 1
-                print(f"  Processing tender {processed}/{len(filtered_tenders)}: {tender.get('title', 'Unknown')}")
-                
-                form_url = tender.get("form_url")
-                if not form_url:
-                    continue
-                
-                # Extract eligibility if not already done
-                raw_eligibility = tender.get("raw_eligibility")
-                if not raw_eligibility:
-                    print(f"    Extracting eligibility from {form_url}")
-                    raw_eligibility = extract_eligibility_text_from_url(form_url)
-                    if raw_eligibility:
-                        tenders.update_one(
-                            {"_id": tender["_id"]},
-                            {"$set": {"raw_eligibility": raw_eligibility, "last_updated": datetime.utcnow()}}
-                        )
-                
-                # Parse structured eligibility if not already done
-                structured_eligibility = tender.get("structured_eligibility")
-                if not structured_eligibility and raw_eligibility:
-                    print(f"    Parsing structured eligibility")
-                    structured_eligibility = extract_eligibility_json_general(raw_eligibility)
-                    if structured_eligibility:
-                        tenders.update_one(
-                            {"_id": tender["_id"]},
-                            {"$set": {"structured_eligibility": structured_eligibility, "last_updated": datetime.utcnow()}}
-                        )
-                
-                # Compute matching score
-                if structured_eligibility:
-                    result = compute_tender_match_score(structured_eligibility, company)
-                    
-                    if result["matching_score"] >= threshold:
-                        match_data = {
-                            "tender_id": str(tender["_id"]),
-                            "title": tender.get("title"),
-                            "reference_number": tender.get("reference_number"),
-                            "location": tender.get("location"),
-                            "business_category": tender.get("business_category", []),
-                            "deadline": tender.get("deadline"),
-                            "form_url": form_url,
-                            "matching_score": result["matching_score"],
-                            "field_scores": result["field_scores"],
-                            "eligible": result["eligible"],
-                            "missing_fields": result["missing_fields"],
-                            "emd": tender.get("emd"),
-                            "estimated_budget": tender.get("estimated_budget")
-                        }
-                        matches.append(match_data)
-                        print(f"    ✅ Match found: {result['matching_score']:.1f}% score")
-                    else:
-                        print(f"    ❌ Below threshold: {result['matching_score']:.1f}% score")
-                
-            except Exception as tender_error:
-                print(f"    ⚠️ Error processing tender: {str(tender_error)}")
-                continue
-        
-        # Sort matches by score
-        matches.sort(key=lambda x: x["matching_score"], reverse=True)
+        matches = [match_summary(doc, id_key="tender_id") for doc in outcome["matches"]]
+        for match in matches:
+            print(f"    ✅ Match found: {match['title']} ({match['matching_score']:.1f}% score)")
         
         return {
             "success": True,
             "user_id": user_id,
             "company_name": company.get('companyDetails', {}).get('companyName', 'Unknown'),
-            "total_filtered": len(filtered_tenders),
+            "total_filtered": outcome["total_filtered"],
             "total_matches": len(matches),
+            "recomputed": outcome["recomputed"],
+            "reused": outcome["reused"],
             "matches": matches,
             "threshold": threshold
         }
@@ -201,6 +140,14 @@ def run_matching_for_all_users(threshold: float = 60.0) -> dict:
             "error": str(e)
         }
 
+def purge_eligibility_cache():
+    """Drop cached eligibility parses made with an older prompt version"""
+    try:
+        deleted = purge_stale_versions(ELIGIBILITY_PROMPT_VERSION)
+        print(f"🧹 Removed {deleted} cached eligibility parses (current prompt version: {ELIGIBILITY_PROMPT_VERSION})")
+    except Exception as e:
+        print(f"❌ Error purging eligibility cache: {e}")
+
 def get_matching_statistics():
     """Display matching statistics"""
     try:
@@ -213,12 +160,14 @@ def get_matching_statistics():
         # Count tenders with processed eligibility
         tenders_with_raw = tenders.count_documents({"raw_eligibility": {"$exists": True, "$ne": ""}})
         tenders_with_structured = tenders.count_documents({"structured_eligibility": {"$exists": True, "$ne": {}}})
+        stored_matches = db["matches"].count_documents({})
         
         print("\n📊 Matching Pipeline Statistics:")
         print(f"  Total Companies: {total_companies}")
         print(f"  Total Tenders: {total_tenders}")
         print(f"  Tenders with Raw Eligibility: {tenders_with_raw}")
         print(f"  Tenders with Structured Eligibility: {tenders_with_structured}")
+        print(f"  Stored Matches: {stored_matches}")
         print(f"  Processing Coverage: {(tenders_with_structured/total_tenders*100):.1f}%" if total_tenders > 0 else "  Processing Coverage: 0%")
         
     except Exception as e:
@@ -234,6 +183,7 @@ def main():
         print("  user <user_id> [threshold]  - Run matching for specific user")
         print("  all [threshold]             - Run matching for all users")
         print("  stats                       - Show matching statistics")
+        print("  purge-cache                 - Drop eligibility parses from old prompt versions")
         print("\nExamples:")
         print("  python run_tender_matching.py user 12345 70.0")
         print("  python run_tender_matching.py all 60.0")
@@ -292,9 +242,12 @@ def main():
     elif command == "stats":
         get_matching_statistics()
         
+    elif command == "purge-cache":
+        purge_eligibility_cache()
+        
     else:
         print(f"❌ Unknown command: {command}")
-        print("Available commands: user, all, stats")
+        print("Available commands: user, all, stats, purge-cache")
         sys.exit(1)
 
 if __name__ == "__main__":
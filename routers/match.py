@@ -1,16 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from bson import ObjectId
 from core.database import db
-from services.basic_filter import filter_tenders
-from services.eligibility_extractor import extract_eligibility_text_from_url
-from services.eligibility_parser import extract_eligibility_json_general
-from services.tender_matcher import compute_tender_match_score
-from services.summarizer import PDFSummaryService
+from services.basic_filter import filter_tender_ids, iter_filtered_tenders, iter_tenders_by_ids
+from services.match_pipeline import run_match_pipeline
+from services.match_store import get_ranked_matches, match_summary, TENDER_SUMMARY_FIELDS
+from services.match_jobs import submit_match_job, get_match_job, start_match_events, MatchJobQueueFull, MatchJobConflict
+from models.match_models import MatchResult
+from services.tender_summary import get_tender_summary, stream_tender_summary
+from services.summarizer import SummaryIncomplete
+from services.document_fetcher import DocumentFetchError
+from services.summary_snapshots import create_snapshot, get_snapshot_page, encode_cursor, decode_cursor, InvalidCursor
 from routers.auth import get_current_user
-from datetime import datetime
-from tempfile import NamedTemporaryFile
+from typing import Optional
 import traceback
-import requests
+import json
+import heapq
 import os
 from urllib.parse import urlparse
 router = APIRouter()
@@ -20,31 +26,86 @@ tenders = db["filtered_tenders"]
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "your_gemini_api_key_here")
 
+# Tender summaries only carry the listing fields, never eligibility text or embeddings
+SUMMARY_PROJECTION = {field: 1 for field in TENDER_SUMMARY_FIELDS}
+SUMMARY_MAX_PAGE_SIZE = int(os.getenv("SUMMARY_MAX_PAGE_SIZE", "500"))
+
 def serialize_tender(tender):
     """Convert ObjectId to string for JSON serialization"""
     if "_id" in tender:
         tender["_id"] = str(tender["_id"])
     return tender
 
+def _summary_line(payload: dict) -> str:
+    return json.dumps(payload, default=str) + "\n"
+
+def _stream_tenders_summary(company: dict, total_tenders: int):
+    """NDJSON lines: one {"tender": ...} per tender as it passes the filter, then the counts"""
+    filtered_count = 0
+    try:
+        for tender in iter_filtered_tenders(company, projection=SUMMARY_PROJECTION):
+            filtered_count += 1
+            yield _summary_line({"tender": serialize_tender(tender)})
+    except Exception as e:
+        print(f"Summary stream error: {str(e)}")
+        print(traceback.format_exc())
+        yield _summary_line({"error": f"Failed to get tender summary: {str(e)}"})
+        return
+    yield _summary_line({"total_tenders": total_tenders, "filtered_tenders": filtered_count})
+
 @router.get("/tenders/summary")
-def get_tenders_summary(current_user: dict = Depends(get_current_user)):
-    """Get total and filtered tender counts"""
+def get_tenders_summary(
+    limit: int = Query(50, ge=1, le=SUMMARY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get total and filtered tender counts with one page of slim filtered tenders.
+
+    Pass the returned next_cursor to get the following page, or stream=true to
+    receive every filtered tender as NDJSON while the filter runs. The filter
+    runs for the first page only; its ranked ids are kept for
+    SUMMARY_SNAPSHOT_TTL_SECONDS and later pages read their slice of that list.
+    """
     try:
         company = companies.find_one({"user_id": current_user["id"]})
-        print("📄 Loaded company profile:", company)
 
         if not company:
             raise HTTPException(status_code=404, detail="Company profile not found. Please complete your profile first.")
+        print(f"📄 Loaded company profile {company['_id']}")
+
+        total_tenders = tenders.estimated_document_count()
+
+        if stream:
+            return StreamingResponse(
+                _stream_tenders_summary(company, total_tenders),
+                media_type="application/x-ndjson"
+            )
 
-        total_tenders = tenders.count_documents({})
-        filtered = filter_tenders(company)
-        serialized_filtered = [serialize_tender(t) for t in filtered]
+        if cursor:
+            token, start = decode_cursor(cursor)
+            page_ids, filtered_count = get_snapshot_page(token, current_user["id"], start, limit)
+        else:
+            tender_ids = filter_tender_ids(company)
+            token, start = None, 0
+            page_ids, filtered_count = tender_ids[:limit], len(tender_ids)
+            if filtered_count > limit:
+                token = create_snapshot(current_user["id"], tender_ids)
+
+        page = [serialize_tender(t) for t in iter_tenders_by_ids(page_ids, SUMMARY_PROJECTION)]
+        has_more = start + limit < filtered_count
 
         return {
             "total_tenders": total_tenders,
-            "filtered_tenders": len(serialized_filtered),
-            "filtered_list": serialized_filtered
+            "filtered_tenders": filtered_count,
+            "filtered_list": page,
+            "next_cursor": encode_cursor(token, start + limit) if has_more else None
         }
+    except HTTPException:
+        raise
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=f"{str(e)}. Restart from the first page.")
     except Exception as e:
         print(f"Summary error: {str(e)}")
         print(traceback.format_exc())
@@ -52,121 +113,251 @@ def get_tenders_summary(current_user: dict = Depends(get_current_user)):
 
 @router.post("/tenders/match")
 def match_tenders(current_user: dict = Depends(get_current_user)):
-    """Run tender matching pipeline"""
+    """Run tender matching pipeline, recomputing only pairs that changed since the last run"""
     try:
         company = companies.find_one({"user_id": current_user["id"]})
         if not company:
             raise HTTPException(status_code=404, detail="Company profile not found. Please complete your profile first.")
 
-        filtered_tenders_list = filter_tenders(company)
+        threshold = 60.0
+        outcome = run_match_pipeline(company, threshold)
 
-        if not filtered_tenders_list:
+        if not outcome["total_filtered"]:
             return {
                 "message": "No tenders match your company profile",
                 "matches": []
             }
 
-        threshold = 60.0
-        results = []
-
-        for tender in filtered_tenders_list:
-            form_url = tender.get("form_url")
-            if not form_url:
-                continue
-
-            try:
-                raw_eligibility = tender.get("raw_eligibility")
-                if not raw_eligibility:
-                    raw_eligibility = extract_eligibility_text_from_url(form_url)
-                    if raw_eligibility:
-                        tenders.update_one(
-                            {"_id": tender["_id"]},
-                            {"$set": {"raw_eligibility": raw_eligibility, "last_updated": datetime.utcnow()}}
-                        )
-
-                structured_eligibility = tender.get("structured_eligibility")
-                if not structured_eligibility:
-                    structured_eligibility = extract_eligibility_json_general(raw_eligibility)
-                    
-                    if structured_eligibility:
-                        tenders.update_one(
-                            {"_id": tender["_id"]},
-                            {"$set": {"structured_eligibility": structured_eligibility, "last_updated": datetime.utcnow()}}
-                        )
-
-                result = compute_tender_match_score(structured_eligibility, company)
-
-                if result["matching_score"] >= threshold:
-                    match_data = {
-                        "_id": str(tender["_id"]),
-                        "title": tender.get("title"),
-                        "reference_number": tender.get("reference_number"),
-                        "location": tender.get("location"),
-                        "business_category": tender.get("business_category", []),
-                        "deadline": tender.get("deadline"),
-                        "form_url": form_url,
-                        "matching_score": result["matching_score"],
-                        "field_scores": result["field_scores"],
-                        "eligible": result["eligible"],
-                        "missing_fields": result["missing_fields"],
-                        "emd": tender.get("emd"),
-                        "estimated_budget": tender.get("estimated_budget")
-                    }
-                    results.append(match_data)
-
-            except Exception as tender_error:
-                print(f"Error processing tender {tender.get('title')}: {str(tender_error)}")
-                continue
-
-        results.sort(key=lambda x: x["matching_score"], reverse=True)
+        results = [match_summary(doc) for doc in outcome["matches"]]
 
         return {
             "message": f"Found {len(results)} matching tenders",
             "matches": results
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Matching error: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Failed to match tenders: {str(e)}")
 
+def _match_result(doc: dict) -> dict:
+    """A stored match as a serialized MatchResult"""
+    tender = doc.get("tender", {})
+    return jsonable_encoder(MatchResult(
+        tender_id=doc["tender_id"],
+        form_url=tender.get("form_url") or "",
+        title=tender.get("title") or "",
+        reference_number=tender.get("reference_number"),
+        location=tender.get("location"),
+        business_category=tender.get("business_category") or [],
+        deadline=str(tender["deadline"]) if tender.get("deadline") else None,
+        matching_score=doc["matching_score"],
+        eligible=doc["eligible"],
+        field_scores=doc["field_scores"],
+        missing_fields=doc["missing_fields"]
+    ))
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _stream_match_events(events, top_k: int):
+    """SSE frames: a match per scored tender, the running top-k after each step, then the sorted summary"""
+    top = []  # min-heap of (score, tender_id, result)
+    try:
+        for event, payload in events:
+            if event == "keepalive":
+                yield ": keep-alive\n\n"
+            elif event == "progress":
+                yield _sse("progress", {k: payload[k] for k in ("stage", "processed", "total")})
+                if not payload["matches"]:
+                    continue
+                for doc in payload["matches"]:
+                    result = _match_result(doc)
+                    yield _sse("match", result)
+                    entry = (result["matching_score"], result["tender_id"], result)
+                    if len(top) < top_k:
+                        heapq.heappush(top, entry)
+                    elif entry[:2] > top[0][:2]:
+                        heapq.heapreplace(top, entry)
+                yield _sse("top", [result for _, _, result in sorted(top, key=lambda entry: entry[:2], reverse=True)])
+            elif event == "done":
+                results = [_match_result(doc) for doc in payload["matches"]]
+                yield _sse("summary", {
+                    "message": f"Found {len(results)} matching tenders",
+                    "total_filtered": payload["total_filtered"],
+                    "reused": payload["reused"],
+                    "recomputed": payload["recomputed"],
+                    "matches": results
+                })
+            else:
+                yield _sse("error", {"detail": f"Failed to match tenders: {payload}"})
+    finally:
+        # Client went away (or the run ended): stop the run it was driving
+        events.close()
+
+@router.get("/tenders/match/stream")
+def stream_match_tenders(
+    threshold: float = 60.0,
+    top_k: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Run tender matching and push each MatchResult as a server-sent event as soon as it is scored"""
+    try:
+        company = companies.find_one({"user_id": current_user["id"]})
+        if not company:
+            raise HTTPException(status_code=404, detail="Company profile not found. Please complete your profile first.")
+
+        # Admit the run before streaming so a refusal is still an HTTP error
+        events = start_match_events(company, current_user["id"], threshold)
+
+        return StreamingResponse(
+            _stream_match_events(events, top_k),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    except HTTPException:
+        raise
+    except MatchJobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Matching is busy, please retry shortly: {str(e)}")
+    except MatchJobConflict as e:
+        raise HTTPException(status_code=409, detail=f"{str(e)}; poll /tenders/match/jobs/{e.job['_id']} for its progress")
+    except Exception as e:
+        print(f"Match stream error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to match tenders: {str(e)}")
+
+@router.post("/tenders/match/jobs", status_code=202)
+def start_match_job(threshold: float = 60.0, current_user: dict = Depends(get_current_user)):
+    """Start the matching pipeline in the background and return a job id to poll"""
+    try:
+        company = companies.find_one({"user_id": current_user["id"]})
+        if not company:
+            raise HTTPException(status_code=404, detail="Company profile not found. Please complete your profile first.")
+
+        job = submit_match_job(company, current_user["id"], threshold)
+
+        return {
+            "message": "Matching started",
+            "job_id": job["_id"],
+            "status": job["status"]
+        }
+
+    except HTTPException:
+        raise
+    except MatchJobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Matching is busy, please retry shortly: {str(e)}")
+    except Exception as e:
+        print(f"Match job error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to start matching: {str(e)}")
+
+@router.get("/tenders/match/jobs/{job_id}")
+def get_match_job_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Poll a background matching job for its progress and the matches found so far"""
+    try:
+        job = get_match_job(job_id)
+        if not job or job["user_id"] != current_user["id"]:
+            raise HTTPException(status_code=404, detail="Matching job not found")
+
+        results = [match_summary(doc) for doc in job["matches"]]
+
+        return {
+            "job_id": job["_id"],
+            "status": job["status"],
+            "progress": job["progress"],
+            "error": job.get("error"),
+            "created_at": job["created_at"],
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at"),
+            "message": f"Found {len(results)} matching tenders",
+            "matches": results
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Match job status error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to load matching job: {str(e)}")
+
+@router.get("/tenders/matches")
+def get_precomputed_matches(
+    threshold: float = 60.0,
+    limit: int = 100,
+    skip: int = 0,
+    current_user: dict = Depends(get_current_user)
+):
+    """Serve the stored match ranking from the last matching run without recomputing"""
+    try:
+        company = companies.find_one({"user_id": current_user["id"]}, {"_id": 1})
+        if not company:
+            raise HTTPException(status_code=404, detail="Company profile not found. Please complete your profile first.")
+
+        docs = get_ranked_matches(str(company["_id"]), threshold=threshold, limit=limit, skip=skip)
+        results = [match_summary(doc) for doc in docs]
+
+        return {
+            "message": f"Found {len(results)} matching tenders",
+            "matches": results
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Stored matches error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to load matches: {str(e)}")
+
+def _stream_summary_chunks(tender_id: str, chunks):
+    try:
+        yield from chunks
+    except SummaryIncomplete as e:
+        print(f"⚠️ Incomplete summary for tender {tender_id}, not cached: {str(e)}")
+        yield f"\n\n[Summary incomplete: {str(e)}]"
+    except Exception as e:
+        print(f"Summary stream error for tender {tender_id}: {str(e)}")
+        print(traceback.format_exc())
+        yield f"\n\n[Summary interrupted: {str(e)}]"
+
 @router.get("/tenders/{tender_id}/summarize")
-def summarize_tender(tender_id: str, current_user: dict = Depends(get_current_user)):
-    """Generate Gemini AI summary for a specific tender PDF"""
+def summarize_tender(tender_id: str, stream: bool = False, current_user: dict = Depends(get_current_user)):
+    """Generate Gemini AI summary for a specific tender PDF, cached per document; stream=true sends it as plain text while it is generated"""
     try:
-        tender = tenders.find_one({"_id": ObjectId(tender_id)})
+        tender = tenders.find_one({"_id": ObjectId(tender_id)}, {"form_url": 1, "summary": 1})
         if not tender:
             raise HTTPException(status_code=404, detail="Tender not found")
 
         form_url = tender.get("form_url")
         print(f"📄 Summarizing tender {tender_id} from URL: {form_url}")
-        
 
-        parsed_url = urlparse(form_url)
+        parsed_url = urlparse(form_url or "")
         if not parsed_url.path.endswith(".pdf"):
            raise HTTPException(status_code=400, detail="Tender does not contain a valid PDF for summarization.")
 
+        if stream:
+            chunks, cached = stream_tender_summary(tender, GEMINI_API_KEY)
+            return StreamingResponse(
+                _stream_summary_chunks(tender_id, chunks),
+                media_type="text/plain; charset=utf-8",
+                headers={"X-Summary-Cached": str(cached).lower(), "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
 
-        # Download the PDF to a temporary file
-        with NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            response = requests.get(form_url)
-            if response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Failed to download tender PDF.")
-            tmp_file.write(response.content)
-            tmp_pdf_path = tmp_file.name
-
-        # Summarize using Gemini
-        service = PDFSummaryService(api_key=GEMINI_API_KEY)
-        summary_text = service.summarize_pdf(tmp_pdf_path)
-
-        # Clean up
-        os.remove(tmp_pdf_path)
+        summary = get_tender_summary(tender, GEMINI_API_KEY)
 
         return {
             "tender_id": tender_id,
-            "summary": summary_text.strip()
+            "summary": summary["text"],
+            "cached": summary["cached"]
         }
 
+    except HTTPException:
+        raise
+    except DocumentFetchError as e:
+        print(f"Summarization download error: {str(e)}")
+        raise HTTPException(status_code=400, detail="Failed to download tender PDF.")
     except Exception as e:
         print(f"Summarization error: {str(e)}")
         print(traceback.format_exc())
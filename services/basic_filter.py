@@ -1,13 +1,96 @@
+import os
+import threading
+import time
+import numpy as np
+from bson import ObjectId
 from pymongo import MongoClient
-from sentence_transformers import SentenceTransformer, util
+from pymongo.errors import PyMongoError
+from sentence_transformers import util
 from datetime import datetime
 from core.database import db  # assumes your db is initialized here
-
-# Load model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+from core.utils import parse_deadline, open_tenders_query
+from services.embedding_cache import embed_texts
+from services.tender_index import TenderIndex
 
 # Collection
 filtered_tenders = db.get_collection("filtered_tenders")
+# Ids of deleted tenders, so every worker drops them from its index on its next sync
+tender_tombstones = db.get_collection("tender_index_tombstones")
+
+CATEGORY_SIMILARITY_THRESHOLD = 0.6
+
+# Approximate nearest-neighbour index over tender embeddings
+TENDER_INDEX_ENABLED = os.getenv("TENDER_INDEX_ENABLED", "true").lower() == "true"
+TENDER_INDEX_PATH = os.getenv(
+    "TENDER_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "storage", "index", "tender_index.npz")
+)
+TENDER_INDEX_TOP_K = int(os.getenv("TENDER_INDEX_TOP_K", "500"))
+TENDER_INDEX_NPROBE = int(os.getenv("TENDER_INDEX_NPROBE", "16"))
+# Minimum time between syncs of the index with the collection
+TENDER_INDEX_SYNC_SECONDS = float(os.getenv("TENDER_INDEX_SYNC_SECONDS", "5"))
+# How often a sync also compares every indexed id with the collection, catching deletes made
+# outside TenderInserter and tombstones that expired before an old index file was loaded
+TENDER_INDEX_RECONCILE_SECONDS = float(os.getenv("TENDER_INDEX_RECONCILE_SECONDS", "600"))
+TENDER_TOMBSTONE_TTL_DAYS = int(os.getenv("TENDER_TOMBSTONE_TTL_DAYS", "7"))
+
+# Tenders are streamed from Mongo in batches of this size
+FILTER_BATCH_SIZE = int(os.getenv("FILTER_BATCH_SIZE", "500"))
+
+# Fields needed to (re)build index rows for a tender
+INDEX_PROJECTION = {
+    "business_category": 1,
+    "category_embeddings": 1,
+    "scope_of_work": 1,
+    "scope_embedding": 1,
+    "deadline": 1,
+    "deadline_at": 1,
+    "last_updated": 1
+}
+# Embedding fields are internal and never returned to callers
+EMBEDDING_FIELDS = {"category_embeddings": 0, "scope_embedding": 0}
+
+_tender_index = None
+_tender_index_lock = threading.Lock()
+_tender_index_sync_lock = threading.Lock()
+_tender_index_synced_at = 0.0
+_tender_index_reconciled_at = None
+
+try:
+    tender_tombstones.create_index("deleted_at", expireAfterSeconds=TENDER_TOMBSTONE_TTL_DAYS * 24 * 3600)
+except PyMongoError as e:
+    print(f"Error creating tender tombstone indexes: {str(e)}")
+
+
+def normalize_categories(categories) -> list:
+    """
+    Clean tender categories the same way for storage, embedding and matching.
+    """
+    if isinstance(categories, str):
+        categories = categories.split(",")
+    if not isinstance(categories, list):
+        return []
+    return [str(cat).strip().lower() for cat in categories if str(cat).strip()]
+
+
+def encode_categories(categories) -> list:
+    """
+    Encode tender categories into normalized embeddings that can be stored with the tender.
+    """
+    clean_categories = normalize_categories(categories)
+    if not clean_categories:
+        return []
+    return embed_texts(clean_categories).tolist()
+
+
+def encode_scope(scope_of_work):
+    """
+    Encode a tender's scope of work into a normalized embedding, or None if it is empty.
+    """
+    text = str(scope_of_work or "").strip()
+    if not text:
+        return None
+    return embed_texts(text).tolist()
 
 
 def get_company_categories(company_profile: dict):
@@ -43,46 +126,351 @@ def get_company_categories(company_profile: dict):
     return clean_categories
 
 
-def is_category_similar(list1, list2, threshold=0.6):
+def is_category_similar(list1, list2, threshold=CATEGORY_SIMILARITY_THRESHOLD):
     """
     Semantic similarity between categories using SentenceTransformer.
     """
-    for a in list1:
-        for b in list2:
-            a_enc = model.encode(a, convert_to_tensor=True)
-            b_enc = model.encode(b, convert_to_tensor=True)
-            score = util.cos_sim(a_enc, b_enc).item()
-            if score >= threshold:
-                return True
-    return False
+    if not list1 or not list2:
+        return False
+    emb1 = embed_texts(list1)
+    emb2 = embed_texts(list2)
+    return bool((util.cos_sim(emb1, emb2) >= threshold).any())
 
 
-def filter_tenders(company_profile: dict):
+def _backfill_embeddings(tenders: list):
     """
-    Main function to filter tenders based on company profile match.
+    Compute and store category and scope embeddings for tenders inserted before they were precomputed.
+    """
+    stale = []
+    for tender in tenders:
+        categories = normalize_categories(tender.get("business_category", []))
+        stored = tender.get("category_embeddings")
+        if stored is None or len(stored) != len(categories):
+            stale.append((tender, categories))
+
+    if stale:
+        print(f"🔄 Backfilling category embeddings for {len(stale)} tenders")
+        all_categories = [cat for _, categories in stale for cat in categories]
+        encoded = []
+        if all_categories:
+            encoded = embed_texts(all_categories).tolist()
+
+        offset = 0
+        for tender, categories in stale:
+            embeddings = encoded[offset:offset + len(categories)]
+            offset += len(categories)
+            tender["category_embeddings"] = embeddings
+            filtered_tenders.update_one(
+                {"_id": tender["_id"]},
+                {"$set": {"category_embeddings": embeddings}}
+            )
+
+    for tender in tenders:
+        if "scope_embedding" not in tender:
+            tender["scope_embedding"] = encode_scope(tender.get("scope_of_work"))
+            filtered_tenders.update_one(
+                {"_id": tender["_id"]},
+                {"$set": {"scope_embedding": tender["scope_embedding"]}}
+            )
+
+
+def _backfill_deadlines(tenders: list):
+    """
+    Parse and store deadline_at for tenders inserted before deadlines were normalized.
+    """
+    for tender in tenders:
+        if "deadline_at" not in tender:
+            tender["deadline_at"] = parse_deadline(tender.get("deadline"))
+            filtered_tenders.update_one(
+                {"_id": tender["_id"]},
+                {"$set": {"deadline_at": tender["deadline_at"]}}
+            )
+
+
+def _is_open(tender: dict, now: datetime) -> bool:
+    deadline_at = tender.get("deadline_at")
+    return deadline_at is None or deadline_at >= now
+
+
+def _iter_batches(cursor, batch_size: int = FILTER_BATCH_SIZE):
+    """Group a cursor into lists of at most batch_size documents"""
+    batch = []
+    for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_tenders_by_ids(tender_ids: list, projection: dict = None, batch_size: int = FILTER_BATCH_SIZE):
+    """
+    Yield tender documents for tender_ids, in the given order, fetching batch_size at a time.
+    """
+    projection = projection if projection is not None else EMBEDDING_FIELDS
+    for start in range(0, len(tender_ids), batch_size):
+        chunk = [ObjectId(tender_id) for tender_id in tender_ids[start:start + batch_size]]
+        by_id = {doc["_id"]: doc for doc in filtered_tenders.find({"_id": {"$in": chunk}}, projection)}
+        for object_id in chunk:
+            if object_id in by_id:
+                yield by_id[object_id]
+
+
+def _tender_vectors(tender: dict) -> dict:
+    """Index rows for a tender, by kind"""
+    scope_embedding = tender.get("scope_embedding")
+    return {
+        "category": tender.get("category_embeddings") or [],
+        "scope": [scope_embedding] if scope_embedding else []
+    }
+
+
+def _sync_tender_index(index: TenderIndex, reconcile: bool = False):
+    """
+    Apply tenders changed or deleted since the index watermarks, including changes made by
+    other workers. With reconcile, also drop indexed ids that are no longer in the collection.
+    """
+    query = {"last_updated": {"$gt": index.watermark}} if index.watermark else {}
+    cursor = filtered_tenders.find(query, INDEX_PROJECTION).batch_size(FILTER_BATCH_SIZE)
+    for batch in _iter_batches(cursor, FILTER_BATCH_SIZE):
+        _backfill_embeddings(batch)
+        _backfill_deadlines(batch)
+        for tender in batch:
+            index.upsert(str(tender["_id"]), _tender_vectors(tender), tender.get("deadline_at"))
+        timestamps = [t["last_updated"] for t in batch if isinstance(t.get("last_updated"), datetime)]
+        if timestamps:
+            index.watermark = max(timestamps + ([index.watermark] if index.watermark else []))
+
+    deleted_query = {"deleted_at": {"$gt": index.deletion_watermark}} if index.deletion_watermark else {}
+    for tombstone in tender_tombstones.find(deleted_query).sort("deleted_at", 1):
+        index.remove(tombstone["_id"])
+        index.deletion_watermark = tombstone["deleted_at"]
+
+    if reconcile:
+        # Read after the upserts above, so tenders inserted during this sync are not dropped
+        live_ids = {str(t["_id"]) for t in filtered_tenders.find({}, {"_id": 1})}
+        for tender_id in index.indexed_tender_ids():
+            if tender_id not in live_ids:
+                index.remove(tender_id)
+
+    index.persist(TENDER_INDEX_PATH)
+
+
+def get_tender_index() -> TenderIndex:
+    """
+    Return this worker's tender index, loading it from disk (or building it) on first use
+    and bringing it up to date with the collection.
+
+    Only the first call waits for the initial sync. Later syncs run at most every
+    TENDER_INDEX_SYNC_SECONDS, and while one request is syncing the others use
+    the index as it stands instead of queuing behind the Mongo round trip.
+    """
+    global _tender_index
+    with _tender_index_lock:
+        if _tender_index is None:
+            index = None
+            if os.path.exists(TENDER_INDEX_PATH):
+                try:
+                    index = TenderIndex.load(TENDER_INDEX_PATH, nprobe=TENDER_INDEX_NPROBE)
+                    print(f"🗂️ Loaded tender index with {index.tender_count()} tenders from {TENDER_INDEX_PATH}")
+                except Exception as e:
+                    print(f"⚠️ Could not load tender index, rebuilding: {e}")
+            if index is None:
+                index = TenderIndex(nprobe=TENDER_INDEX_NPROBE)
+                filtered_tenders.create_index("last_updated")
+            _sync_if_due(index, wait=True)
+            _tender_index = index
+    _sync_if_due(_tender_index)
+    return _tender_index
+
+
+def _sync_if_due(index: TenderIndex, wait: bool = False):
+    global _tender_index_synced_at, _tender_index_reconciled_at
+    if not wait and time.monotonic() - _tender_index_synced_at < TENDER_INDEX_SYNC_SECONDS:
+        return
+    if not _tender_index_sync_lock.acquire(blocking=wait):
+        return
+    try:
+        started = time.monotonic()
+        reconcile = _tender_index_reconciled_at is None or started - _tender_index_reconciled_at >= TENDER_INDEX_RECONCILE_SECONDS
+        _sync_tender_index(index, reconcile)
+        _tender_index_synced_at = time.monotonic()
+        if reconcile:
+            _tender_index_reconciled_at = started
+    finally:
+        _tender_index_sync_lock.release()
+
+
+def index_tender(tender: dict):
+    """
+    Add or refresh one tender in the index. Called by TenderInserter after writes.
+    """
+    if not TENDER_INDEX_ENABLED:
+        return
+    index = get_tender_index()
+    index.upsert(str(tender["_id"]), _tender_vectors(tender), tender.get("deadline_at"))
+    index.persist(TENDER_INDEX_PATH)
+
+
+def unindex_tender(tender_id: str):
+    """
+    Remove one tender from the index and leave a tombstone for the other workers' indexes.
+    Called by TenderInserter after deletes.
+    """
+    if not TENDER_INDEX_ENABLED:
+        return
+    tender_tombstones.update_one(
+        {"_id": str(tender_id)},
+        {"$set": {"deleted_at": datetime.utcnow()}},
+        upsert=True
+    )
+    index = get_tender_index()
+    index.remove(str(tender_id))
+    index.persist(TENDER_INDEX_PATH)
+
+
+def persist_tender_index():
+    """Write pending index changes to disk immediately"""
+    if _tender_index is not None:
+        _tender_index.persist(TENDER_INDEX_PATH, force=True)
+
+
+def _filter_tender_ids_indexed(
+    keyword_matrix: np.ndarray,
+    threshold: float,
+    top_k: int,
+    include_scope: bool,
+    open_after: datetime = None
+) -> list:
+    """
+    Query the ANN index for the top-k open tenders per company keyword scoring above threshold.
+    """
+    kinds = ("category", "scope") if include_scope else ("category",)
+    hits = get_tender_index().search(keyword_matrix, k=top_k, kinds=kinds, threshold=threshold, open_after=open_after)
+
+    best_scores = {}
+    for keyword_hits in hits:
+        for tender_id, _, score in keyword_hits:
+            best_scores[tender_id] = max(best_scores.get(tender_id, -1.0), score)
+    return sorted(best_scores, key=best_scores.get, reverse=True)
+
+
+def _iter_filter_tender_ids_linear(
+    keyword_matrix: np.ndarray,
+    threshold: float,
+    include_scope: bool,
+    open_after: datetime = None
+):
+    """
+    Exact scan: stream only the embedding fields in batches and score each batch in one call,
+    yielding the matching ids of each batch as soon as it is scored.
+    Closed tenders are excluded by the query itself when open_after is given.
+    """
+    scanned = 0
+    query = open_tenders_query(open_after) if open_after else {}
+    cursor = filtered_tenders.find(query, INDEX_PROJECTION).batch_size(FILTER_BATCH_SIZE)
+    for batch in _iter_batches(cursor, FILTER_BATCH_SIZE):
+        scanned += len(batch)
+        _backfill_deadlines(batch)
+        if open_after:
+            batch = [tender for tender in batch if _is_open(tender, open_after)]
+        _backfill_embeddings(batch)
+
+        # Stack every tender vector into one matrix, remembering which tender each row belongs to
+        rows, owners = [], []
+        for position, tender in enumerate(batch):
+            vectors = _tender_vectors(tender)
+            embeddings = vectors["category"] + (vectors["scope"] if include_scope else [])
+            rows.extend(embeddings)
+            owners.extend([position] * len(embeddings))
+
+        if not rows:
+            continue
+
+        scores = util.cos_sim(np.asarray(rows, dtype=np.float32), keyword_matrix).cpu().numpy()
+        best_per_tender = np.full(len(batch), -1.0, dtype=np.float32)
+        np.maximum.at(best_per_tender, np.asarray(owners), scores.max(axis=1))
+
+        matched = [str(tender["_id"]) for tender, best in zip(batch, best_per_tender) if best >= threshold]
+        if matched:
+            yield matched
+
+    print(f"\n📦 Total Tenders Scanned: {scanned}\n")
+
+
+def iter_filter_tender_id_batches(
+    company_profile: dict,
+    threshold: float = CATEGORY_SIMILARITY_THRESHOLD,
+    top_k: int = TENDER_INDEX_TOP_K,
+    include_scope: bool = False,
+    include_expired: bool = False
+):
+    """
+    Yield lists of matching tender ids as they are found.
+
+    With the ANN index the ranked result is available at once and is yielded in
+    FILTER_BATCH_SIZE chunks; the linear scan yields each scanned batch's matches
+    as soon as it is scored, so callers can start emitting before the scan ends.
     """
     company_categories = get_company_categories(company_profile)
     if not company_categories:
         print("🚫 No valid company categories found. Aborting filtering.\n")
-        return []
+        return
 
-    # Fetch tenders
-    tenders = list(filtered_tenders.find())
-    print(f"\n📦 Total Tenders Fetched from DB: {len(tenders)}\n")
+    keyword_matrix = embed_texts(company_categories)
 
-    results = []
-    for tender in tenders:
-        title = tender.get("title", "Untitled Tender")
-        print("➡️ Tender Title:", title)
+    open_after = None if include_expired else datetime.utcnow()
+    if TENDER_INDEX_ENABLED:
+        tender_ids = _filter_tender_ids_indexed(keyword_matrix, threshold, top_k, include_scope, open_after)
+        for start in range(0, len(tender_ids), FILTER_BATCH_SIZE):
+            yield tender_ids[start:start + FILTER_BATCH_SIZE]
+    else:
+        yield from _iter_filter_tender_ids_linear(keyword_matrix, threshold, include_scope, open_after)
 
-        tender_categories = [cat.strip().lower() for cat in tender.get("business_category", []) if cat.strip()]
-        print("   Tender Categories:", tender_categories)
 
-        if is_category_similar(company_categories, tender_categories):
-            print("   ✅ Category matched!\n")
-            results.append(tender)
-        else:
-            print("   ❌ No match.\n")
+def filter_tender_ids(
+    company_profile: dict,
+    threshold: float = CATEGORY_SIMILARITY_THRESHOLD,
+    top_k: int = TENDER_INDEX_TOP_K,
+    include_scope: bool = False,
+    include_expired: bool = False
+) -> list:
+    """
+    Ids of the tenders whose categories match the company profile, without loading the tenders.
+
+    Company keywords are embedded once and matched against precomputed tender
+    category embeddings, through the ANN index when enabled (top_k candidates
+    per keyword) or an exact batched scan otherwise. include_scope also lets
+    scope-of-work embeddings qualify a tender. Tenders past their deadline are
+    dropped before scoring unless include_expired is set.
+    """
+    tender_ids = [
+        tender_id
+        for batch in iter_filter_tender_id_batches(
+            company_profile,
+            threshold=threshold,
+            top_k=top_k,
+            include_scope=include_scope,
+            include_expired=include_expired
+        )
+        for tender_id in batch
+    ]
+
+    print(f"🧮 Tenders after filtering: {len(tender_ids)}\n")
+    return tender_ids
+
+
+def iter_filtered_tenders(company_profile: dict, projection: dict = None, **filter_options):
+    """
+    Stream the tenders matching the company profile as they pass the filter; documents are loaded only for survivors.
+    """
+    for tender_ids in iter_filter_tender_id_batches(company_profile, **filter_options):
+        yield from iter_tenders_by_ids(tender_ids, projection)
+
 
-    print(f"🧮 Tenders after filtering: {len(results)}\n")
-    return results
+def filter_tenders(company_profile: dict, **filter_options):
+    """
+    Main function to filter tenders based on company profile match.
+    """
+    return list(iter_filtered_tenders(company_profile, **filter_options))
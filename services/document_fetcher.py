@@ -0,0 +1,69 @@
+import hashlib
+import os
+import threading
+from typing import Optional
+
+import httpx
+
+DOCUMENT_CONNECT_TIMEOUT = float(os.getenv("DOCUMENT_CONNECT_TIMEOUT", "5"))
+DOCUMENT_READ_TIMEOUT = float(os.getenv("DOCUMENT_READ_TIMEOUT", "60"))
+# Tender PDFs larger than this are refused rather than buffered in memory
+DOCUMENT_MAX_BYTES = int(os.getenv("DOCUMENT_MAX_BYTES", str(50 * 1024 * 1024)))
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+class DocumentFetchError(Exception):
+    """Raised when a tender document cannot be downloaded"""
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide pooled HTTP client for downloading tender documents"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                timeout=httpx.Timeout(DOCUMENT_READ_TIMEOUT, connect=DOCUMENT_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                follow_redirects=True
+            )
+        return _client
+
+
+def content_hash(data: bytes) -> str:
+    """Content address of a document"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def fetch_document(url: str) -> bytes:
+    """Download a document into memory through the pooled client"""
+    try:
+        with get_http_client().stream("GET", url) as response:
+            if response.status_code != 200:
+                raise DocumentFetchError(f"HTTP {response.status_code} for {url}")
+
+            declared = response.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > DOCUMENT_MAX_BYTES:
+                raise DocumentFetchError(f"Document too large ({declared} bytes)")
+
+            chunks, size = [], 0
+            for chunk in response.iter_bytes():
+                size += len(chunk)
+                if size > DOCUMENT_MAX_BYTES:
+                    raise DocumentFetchError(f"Document larger than {DOCUMENT_MAX_BYTES} bytes")
+                chunks.append(chunk)
+            return b"".join(chunks)
+    except httpx.HTTPError as e:
+        raise DocumentFetchError(f"Failed to download {url}: {str(e)}") from e
+
+
+def fetch_etag(url: str) -> Optional[str]:
+    """ETag the server reports for a document, or None if it gives none or cannot be reached"""
+    try:
+        response = get_http_client().head(url, timeout=DOCUMENT_CONNECT_TIMEOUT * 2)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.headers.get("etag")
@@ -0,0 +1,159 @@
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from azure.core.credentials import AzureKeyCredential
+from azure.ai.documentintelligence import DocumentIntelligenceClient
+from azure.ai.documentintelligence.models import AnalyzeResult, AnalyzeDocumentRequest
+from dotenv import load_dotenv
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from core.database import db
+from services.document_fetcher import fetch_document, fetch_etag, content_hash, DocumentFetchError
+
+load_dotenv()
+endpoint = os.getenv("AZURE_DOC_INTEL_ENDPOINT")
+key = os.getenv("AZURE_DOC_INTEL_KEY")
+if not key or not isinstance(key, str):
+    raise ValueError("AZURE_DOC_INTEL_KEY is not set or not a string")
+
+LAYOUT_MODEL_ID = "prebuilt-layout"
+# Per-process ceiling on concurrent layout analyses
+AZURE_DOC_INTEL_CONCURRENCY = int(os.getenv("AZURE_DOC_INTEL_CONCURRENCY", "4"))
+
+# Azure layout results (paragraph text, role and page), keyed by document content hash
+document_layouts = db.get_collection("document_layouts")
+
+try:
+    document_layouts.create_index([("sources", ASCENDING)])
+    document_layouts.create_index([("content_hash", ASCENDING)])
+except PyMongoError as e:
+    print(f"Error creating document layout indexes: {str(e)}")
+
+_client: Optional[DocumentIntelligenceClient] = None
+_client_lock = threading.Lock()
+_azure_slots = threading.BoundedSemaphore(AZURE_DOC_INTEL_CONCURRENCY)
+
+
+def get_document_client() -> DocumentIntelligenceClient:
+    """Process-wide Document Intelligence client (keeps its HTTP connection pool between calls)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = DocumentIntelligenceClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+        return _client
+
+
+def _source_key(url: str, etag: Optional[str]) -> str:
+    """Where a layout came from: URL + ETag, or the bare URL ("url|") when the server sends no ETag"""
+    return f"{url}|{etag or ''}"
+
+
+def _paragraphs(result: AnalyzeResult) -> List[dict]:
+    paragraphs = []
+    for paragraph in result.paragraphs or []:
+        regions = paragraph.bounding_regions or []
+        paragraphs.append({
+            "content": paragraph.content,
+            "role": paragraph.role,
+            "page": regions[0].page_number if regions else None
+        })
+    return paragraphs
+
+
+def analyze_layout(request: AnalyzeDocumentRequest, pages: Optional[str] = None) -> List[dict]:
+    """Run prebuilt-layout (on the given 1-based pages, e.g. "3-6,9", or all) and keep paragraphs as plain dicts"""
+    with _azure_slots:
+        poller = get_document_client().begin_analyze_document(
+            model_id=LAYOUT_MODEL_ID, body=request, pages=pages
+        )
+        return _paragraphs(poller.result())
+
+
+def _find_layout(query: dict, pages: Optional[str]) -> Optional[dict]:
+    """A stored layout covering pages: a whole-document layout serves any selection"""
+    page_filter = [None, pages] if pages else [None]
+    try:
+        return document_layouts.find_one(
+            {**query, "model_id": LAYOUT_MODEL_ID, "pages": {"$in": page_filter}},
+            sort=[("pages", 1)]
+        )
+    except PyMongoError as e:
+        print(f"⚠️ Layout cache unavailable: {str(e)}")
+        return None
+
+
+def _store_layout(document_hash: Optional[str], url: str, etag: Optional[str], pages: Optional[str], paragraphs: List[dict]):
+    source = _source_key(url, etag)
+    layout_id = f"{LAYOUT_MODEL_ID}:{document_hash or source}:{pages or 'all'}"
+    update = {
+        "$set": {
+            "model_id": LAYOUT_MODEL_ID,
+            "content_hash": document_hash,
+            "pages": pages,
+            "paragraphs": paragraphs,
+            "analyzed_at": datetime.utcnow()
+        },
+        "$addToSet": {"sources": source}
+    }
+    try:
+        document_layouts.update_one({"_id": layout_id}, update, upsert=True)
+    except PyMongoError as e:
+        print(f"⚠️ Could not store layout for {url}: {str(e)}")
+
+
+def _remember_source(layout: dict, url: str, etag: Optional[str]):
+    source = _source_key(url, etag)
+    if source not in layout.get("sources", []):
+        try:
+            document_layouts.update_one({"_id": layout["_id"]}, {"$addToSet": {"sources": source}})
+        except PyMongoError as e:
+            print(f"⚠️ Could not record layout source for {url}: {str(e)}")
+
+
+def get_document_layout(url: str, pdf_bytes: Optional[bytes] = None, pages: Optional[str] = None) -> List[dict]:
+    """
+    Layout paragraphs ({content, role, page}) of a document, analyzed by Azure at most once.
+
+    Looked up first by URL + ETag (no download), then by content hash of the
+    downloaded (or given) bytes; only on a miss is the document sent to Azure,
+    as bytes when we have them and by URL otherwise. Every stored layout also
+    records its URL + ETag source (the bare URL when there is no ETag), which
+    is what finds a layout analyzed by URL when the download fails again.
+    pages restricts the analysis (and the billed pages) to a 1-based selection
+    such as "3-6,9"; page numbers in the result still refer to the whole document.
+    """
+    etag = fetch_etag(url) if pdf_bytes is None else None
+    source = _source_key(url, etag)
+    if etag:
+        layout = _find_layout({"sources": source}, pages)
+        if layout:
+            return layout["paragraphs"]
+
+    document_hash = None
+    if pdf_bytes is None:
+        try:
+            pdf_bytes = fetch_document(url)
+        except DocumentFetchError as e:
+            print(f"⚠️ Could not download {url}, letting Azure fetch it: {str(e)}")
+
+    if pdf_bytes is not None:
+        document_hash = content_hash(pdf_bytes)
+        layout = _find_layout({"content_hash": document_hash}, pages)
+        if layout:
+            _remember_source(layout, url, etag)
+            return layout["paragraphs"]
+        request = AnalyzeDocumentRequest(bytes_source=pdf_bytes)
+    else:
+        if not etag:
+            # No ETag and no bytes to hash: the bare URL is all we can key on
+            layout = _find_layout({"sources": source}, pages)
+            if layout:
+                return layout["paragraphs"]
+        request = AnalyzeDocumentRequest(url_source=url)
+
+    paragraphs = analyze_layout(request, pages)
+    _store_layout(document_hash, url, etag, pages, paragraphs)
+    return paragraphs
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from core.database import db
+
+# Structured eligibility parsed by the LLM, keyed by normalized eligibility text and prompt version
+eligibility_parse_cache = db.get_collection("eligibility_parse_cache")
+
+# Entries are re-parsed after this long even if the prompt version never changes
+ELIGIBILITY_CACHE_TTL_DAYS = int(os.getenv("ELIGIBILITY_CACHE_TTL_DAYS", "30"))
+
+try:
+    eligibility_parse_cache.create_index([("prompt_version", ASCENDING)])
+    eligibility_parse_cache.create_index("created_at", expireAfterSeconds=ELIGIBILITY_CACHE_TTL_DAYS * 86400)
+except PyMongoError as e:
+    print(f"Error creating eligibility cache indexes: {str(e)}")
+
+_counts = {"hits": 0, "misses": 0, "stores": 0}
+_counts_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _counts_lock:
+        _counts[name] += 1
+
+
+def normalize_eligibility_text(raw_text: str) -> str:
+    """Whitespace-insensitive form of eligibility text, so reflowed copies share a key (case is kept: codes differ by it)"""
+    return re.sub(r"\s+", " ", raw_text).strip()
+
+
+def eligibility_cache_key(raw_text: str, prompt_version: str) -> str:
+    digest = hashlib.sha256(normalize_eligibility_text(raw_text).encode("utf-8")).hexdigest()
+    return f"{prompt_version}:{digest}"
+
+
+def get_cached_eligibility(raw_text: str, prompt_version: str) -> Optional[dict]:
+    """Stored structured eligibility for this text under this prompt version, counting the hit"""
+    try:
+        doc = eligibility_parse_cache.find_one_and_update(
+            {"_id": eligibility_cache_key(raw_text, prompt_version)},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.utcnow()}},
+            projection={"structured_eligibility": 1}
+        )
+    except PyMongoError as e:
+        print(f"⚠️ Eligibility cache unavailable: {str(e)}")
+        return None
+    _count("hits" if doc else "misses")
+    return doc["structured_eligibility"] if doc else None
+
+
+def store_cached_eligibility(raw_text: str, prompt_version: str, structured_eligibility: dict):
+    """Remember a successful parse; empty results (failed calls) are not cached"""
+    if not structured_eligibility:
+        return
+    now = datetime.utcnow()
+    try:
+        eligibility_parse_cache.update_one(
+            {"_id": eligibility_cache_key(raw_text, prompt_version)},
+            {
+                "$set": {"structured_eligibility": structured_eligibility, "prompt_version": prompt_version},
+                "$setOnInsert": {"hits": 0, "created_at": now}
+            },
+            upsert=True
+        )
+        _count("stores")
+    except PyMongoError as e:
+        print(f"⚠️ Could not store parsed eligibility: {str(e)}")
+
+
+def purge_stale_versions(prompt_version: str) -> int:
+    """Drop entries made with any other prompt version"""
+    result = eligibility_parse_cache.delete_many({"prompt_version": {"$ne": prompt_version}})
+    return result.deleted_count
+
+
+def get_eligibility_cache_stats() -> dict:
+    """Cache lookups in this process since start"""
+    with _counts_lock:
+        counts = dict(_counts)
+    lookups = counts["hits"] + counts["misses"]
+    return {**counts, "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0}
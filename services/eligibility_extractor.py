@@ -1,122 +1,144 @@
 # eligibility_extractor.py
-import re
 import os
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import AnalyzeResult, AnalyzeDocumentRequest
-from dotenv import load_dotenv
-load_dotenv()
-endpoint = os.getenv("AZURE_DOC_INTEL_ENDPOINT")
-key = os.getenv("AZURE_DOC_INTEL_KEY")
-if not key or not isinstance(key, str):
-    raise ValueError("AZURE_DOC_INTEL_KEY is not set or not a string")
-patterns = [  # same as yours
-            r"eligibility criteria",
-            r"eligibility requirements",
-            r"eligibility conditions",
-            r"eligibility standards",
-            r"eligibility rules",
-            r"eligibility qualifications",
-            r"eligibility for participation",
-            r"eligibility for tender",
-            r"eligibility and pre-qualification",
-            r"eligibility & prequalification",
-            r"eligibility/prequalification",
-            r"qualification criteria",
-            r"qualification requirements",
-            r"qualification standards",
-            r"qualification rules",
-            r"qualification and experience",
-            r"minimum eligibility",
-            r"minimum qualification",
-            r"minimum eligibility requirements",
-            r"minimum qualification criteria",
-            r"pre-qualification criteria",
-            r"prequalification requirements",
-            r"pre-qualification standards",
-            r"pre-qualification conditions",
-            r"prequalification process",
-            r"pre-qualification evaluation",
-            r"prequalification of bidders",
-            r"prequalification requirements",
-            r"prequalification of suppliers",
-            r"conditions of participation",
-            r"participation criteria",
-            r"participation requirements",
-            r"tender participation eligibility",
-            r"bidder eligibility",
-            r"bidder qualification",
-            r"bidder pre-qualification",
-            r"submission requirements",
-            r"bid submission eligibility",
-            r"bidder eligibility criteria",
-            r"screening criteria",
-            r"eligibility and qualification criteria for participation in the tender",
-            r"screening of bidders",
-            r"evaluation criteria",
-            r"evaluation of qualification",
-            r"selection criteria",
-            r"selection requirements",
-            r"selection procedure",
-            r"assessment criteria",
-            r"compliance requirements",
-            r"qualification and compliance",
-            r"experience and qualifications",
-            r"technical eligibility",
-            r"financial eligibility",
-            r"legal eligibility",
-            r"vendor eligibility",
-            r"supplier eligibility",
-            r"contractor eligibility",
-            r"applicant eligibility",
-            r"eligibility of tenderers",
-            r"eligibility of bidders",
-            r"bidding eligibility",
-            r"eligibility & pre-qualification",
-            r"eligibility/prequalification",
-            r"pre-qual & eligibility",
-            r"eligibility & qualification",
-            r"eligibility/qualification criteria",
-            r"eligibility",
-            r"qualification",
-            r"pre-qualification",
-            r"prequalification",
-            r"pre qualification",
-            r"pre-qualifications",
-            r"prequalifications",
-            r"pre qualifications"
-        ]
-
-def is_eligibility_heading(text):
-    for pat in patterns:
-        if re.search(pat, text, re.IGNORECASE):
-            return True
-    return False
+import threading
+from services.document_fetcher import fetch_document, content_hash, DocumentFetchError
+from services.document_layout import get_document_layout
+from services.pdf_text import iter_page_texts
+from services.heading_matcher import (
+    patterns, is_eligibility_heading, is_heading_line, find_eligibility_section, find_local_eligibility_section
+)
+
+# Below this average of text-layer characters per page a PDF is treated as scanned
+LOCAL_MIN_CHARS_PER_PAGE = int(os.getenv("ELIGIBILITY_LOCAL_MIN_CHARS_PER_PAGE", "200"))
+# A locally found section shorter than this is not trusted and Azure is asked instead
+LOCAL_MIN_SECTION_CHARS = int(os.getenv("ELIGIBILITY_LOCAL_MIN_SECTION_CHARS", "200"))
+# Pages sent to Azure around each pre-scan hit, and the most pages a targeted analysis may cover
+ELIGIBILITY_PAGE_MARGIN = int(os.getenv("ELIGIBILITY_PAGE_MARGIN", "2"))
+ELIGIBILITY_MAX_TARGET_PAGES = int(os.getenv("ELIGIBILITY_MAX_TARGET_PAGES", "15"))
+
+_tier_counts = {"local": 0, "azure": 0, "none": 0}
+_tier_lock = threading.Lock()
+
+def extract_eligibility_section(paragraphs, headings_only=False) -> str:
+    """
+    Text under the first eligibility heading in layout paragraphs ({content, role} dicts).
+
+    Unless headings_only is set, any paragraph mentioning eligibility is accepted
+    as a heading when no real heading matches.
+    """
+    section = find_eligibility_section(paragraphs, headings_only)
+    if section is None:
+        return ""
+    return "\n".join(p["content"].strip() for p in paragraphs[section.start:section.end])
+
+def extract_local_eligibility_section(paragraphs) -> str:
+    """Text under the first eligibility heading in text-layer lines, up to the next heading of its level"""
+    section = find_local_eligibility_section(paragraphs)
+    if section is None:
+        return ""
+    return "\n".join(p["content"].strip() for p in paragraphs[section.start:section.end])
+
+def local_layout(pdf_bytes: bytes, document_hash: str = None):
+    """
+    Line paragraphs from the PDF text layer, shaped like Azure layout paragraphs.
+
+    Returns (paragraphs, text_chars, page_count).
+    """
+    paragraphs, text_chars, page_count = [], 0, 0
+    for page_number, page_text in iter_page_texts(pdf_bytes, document_hash):
+        page_count += 1
+        text_chars += len(page_text.strip())
+        for line in page_text.splitlines():
+            if line.strip():
+                paragraphs.append({
+                    "content": line,
+                    "role": "sectionHeading" if is_heading_line(line) else None,
+                    "page": page_number + 1
+                })
+    return paragraphs, text_chars, page_count
+
+def _record_tier(tier: str):
+    with _tier_lock:
+        _tier_counts[tier] += 1
+
+def get_extraction_tier_stats() -> dict:
+    """How many eligibility extractions each tier settled since process start"""
+    with _tier_lock:
+        counts = dict(_tier_counts)
+    total = sum(counts.values())
+    return {**counts, "total": total, "local_share": round(counts["local"] / total, 4) if total else 0.0}
+
+def candidate_pages(paragraphs, page_count: int, margin: int = ELIGIBILITY_PAGE_MARGIN, max_pages: int = ELIGIBILITY_MAX_TARGET_PAGES):
+    """
+    Azure page selection (e.g. "3-6,12-14") around the likely eligibility section, from a local pre-scan.
+
+    Pages with an eligibility heading are preferred; otherwise pages with any line
+    matching the heading patterns. Windows of +/- margin pages are taken in
+    document order until max_pages is reached. None means nothing was found
+    (or the selection would cover most of the document), so analyze everything.
+    """
+    headed = [p["page"] for p in paragraphs if p["role"] and is_eligibility_heading(p["content"])]
+    hits = headed or [p["page"] for p in paragraphs if is_eligibility_heading(p["content"])]
+    if not hits or not page_count:
+        return None
+
+    selected = set()
+    for page in dict.fromkeys(hits):
+        window = set(range(max(1, page - margin), min(page_count, page + margin) + 1))
+        if selected and len(selected | window) > max_pages:
+            break
+        selected |= window
+    if not selected or len(selected) * 2 > page_count:
+        return None
+
+    ranges, pages = [], sorted(selected)
+    start = prev = pages[0]
+    for page in pages[1:]:
+        if page != prev + 1:
+            ranges.append((start, prev))
+            start = page
+        prev = page
+    ranges.append((start, prev))
+    return ",".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+
+def extract_eligibility(form_url: str) -> dict:
+    """
+    Eligibility section of a tender document, as {"text", "tier"}.
+
+    The PDF's own text layer is tried first; Azure layout analysis is used only
+    for scanned documents, non-PDFs, or when no eligibility heading is found
+    locally. When the local pre-scan points at likely pages, Azure analyzes only
+    those pages (plus a margin), falling back to the whole document if they hold
+    no section. tier is "local", "azure" or "none" (nothing found).
+    """
+    pdf_bytes, pages = None, None
+    try:
+        pdf_bytes = fetch_document(form_url)
+        document_hash = content_hash(pdf_bytes)
+        paragraphs, text_chars, page_count = local_layout(pdf_bytes, document_hash)
+        if page_count and text_chars / page_count >= LOCAL_MIN_CHARS_PER_PAGE:
+            section_text = extract_local_eligibility_section(paragraphs)
+            if len(section_text) >= LOCAL_MIN_SECTION_CHARS:
+                _record_tier("local")
+                return {"text": section_text, "tier": "local"}
+            print(f"    No eligibility heading in the text layer, using Azure")
+        else:
+            print(f"    No usable text layer ({text_chars} chars over {page_count} pages), using Azure")
+        pages = candidate_pages(paragraphs, page_count)
+    except DocumentFetchError as e:
+        print(f"    ⚠️ Local extraction skipped, download failed: {str(e)}")
+    except Exception as e:
+        print(f"    ⚠️ Local extraction failed, using Azure: {str(e)}")
+
+    section_text = ""
+    if pages:
+        print(f"    Analyzing pages {pages} with Azure")
+        section_text = extract_eligibility_section(get_document_layout(form_url, pdf_bytes=pdf_bytes, pages=pages))
+    if not section_text:
+        section_text = extract_eligibility_section(get_document_layout(form_url, pdf_bytes=pdf_bytes))
+    tier = "azure" if section_text else "none"
+    _record_tier(tier)
+    return {"text": section_text, "tier": tier}
 
 def extract_eligibility_text_from_url(formUrl: str) -> str:
-    client = DocumentIntelligenceClient(
-        endpoint=endpoint,
-        credential=AzureKeyCredential(key)
-    )
-    poller = client.begin_analyze_document(
-        model_id="prebuilt-layout",
-        body=AnalyzeDocumentRequest(url_source=formUrl)
-    )
-    result: AnalyzeResult = poller.result()
-    paragraphs = result.paragraphs or []
-    headings = [(i, p) for i, p in enumerate(paragraphs) if p.role in ("title", "sectionHeading")]
-
-    for idx, (para_idx, para) in enumerate(headings):
-        if is_eligibility_heading(para.content):
-            start_idx = para_idx + 1
-            end_idx = headings[idx + 1][0] if idx + 1 < len(headings) else len(paragraphs)
-            section_text = "\n".join(p.content.strip() for p in paragraphs[start_idx:end_idx])
-            return section_text
-
-    for i, p in enumerate(paragraphs):
-        if is_eligibility_heading(p.content):
-            next_heading = next((h[0] for h in headings if h[0] > i), len(paragraphs))
-            section_text = "\n".join(p.content.strip() for p in paragraphs[i + 1:next_heading])
-            return section_text
-
-    return ""
+    return extract_eligibility(formUrl)["text"]
@@ -1,54 +1,68 @@
-import requests
+import asyncio
 import json
+from typing import Tuple
+from services.json_scanner import JsonObjectScanner, extract_first_json_object
+from services.llm_client import get_zephyr_client, get_async_zephyr_client, LLMRequestError, ZEPHYR_STREAMING
+from services.eligibility_cache import get_cached_eligibility, store_cached_eligibility
 
-def query_self_hosted_zephyr(prompt: str) -> str:
-    API_URL = "http://34.60.71.140:8000/search"  # Replace with your actual IP:port if different
-
-    payload = {
-        "prompt": prompt,
-        "max_tokens": 768  # You can adjust this as your server allows
-    }
+# Bump whenever build_eligibility_prompt (or the cache key) changes; cached parses from other versions are then ignored
+ELIGIBILITY_PROMPT_VERSION = "2"
+# Top-level fields build_eligibility_prompt asks for; a parse missing any of them is not cached
+ELIGIBILITY_FIELDS = (
+    "experience", "gstin", "pan", "required_documents", "certifications",
+    "financial_requirements", "blacklisting_or_litigation", "other_criteria"
+)
 
+def query_self_hosted_zephyr(prompt: str) -> str:
+    """Zephyr completion through the shared pooled client (ZEPHYR_API_URL, timeouts, retries, concurrency limit)"""
     try:
-        response = requests.post(API_URL, json=payload)
-        response.raise_for_status()
-        data = response.json()
-        return data.get("response", "")
-    except requests.RequestException as e:
+        return get_zephyr_client().complete(prompt)
+    except LLMRequestError as e:
         print(f"❌ Request failed: {e}")
         return ""
 
-def extract_first_json_object(text: str) -> dict:
-    if "```json" in text:
-        text = text.split("```json", 1)[1].split("```", 1)[0].strip()
-    elif "```" in text:
-        text = text.split("```", 1)[1].split("```", 1)[0].strip()
+async def query_self_hosted_zephyr_async(prompt: str) -> str:
+    try:
+        return await get_async_zephyr_client().complete(prompt)
+    except LLMRequestError as e:
+        print(f"❌ Request failed: {e}")
+        return ""
 
-    text = text.replace("}\n{", "},\n{").replace("}\n\"", "},\n\"")
+def query_zephyr_json(prompt: str) -> Tuple[str, dict]:
+    """
+    Stream the completion into a JsonObjectScanner and hang up as soon as the
+    first JSON object closes, instead of waiting for max_tokens. Returns the
+    text received and the parsed object ({} if none could be recovered).
+    """
+    scanner = JsonObjectScanner()
+    chunks = get_zephyr_client().stream_complete(prompt)
+    try:
+        for chunk in chunks:
+            parsed = scanner.feed(chunk)
+            if parsed is not None:
+                return scanner.text, parsed
+    except LLMRequestError as e:
+        print(f"❌ Request failed: {e}")
+    finally:
+        chunks.close()
+    return scanner.text, extract_first_json_object(scanner.text)
 
+async def query_zephyr_json_async(prompt: str) -> Tuple[str, dict]:
+    scanner = JsonObjectScanner()
+    chunks = get_async_zephyr_client().stream_complete(prompt)
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
-
-    start = None
-    depth = 0
-    for i, ch in enumerate(text):
-        if ch == '{':
-            if start is None:
-                start = i
-            depth += 1
-        elif ch == '}':
-            depth -= 1
-            if depth == 0 and start is not None:
-                try:
-                    return json.loads(text[start:i + 1])
-                except json.JSONDecodeError:
-                    continue
-    return {}
+        async for chunk in chunks:
+            parsed = scanner.feed(chunk)
+            if parsed is not None:
+                return scanner.text, parsed
+    except LLMRequestError as e:
+        print(f"❌ Request failed: {e}")
+    finally:
+        await chunks.aclose()
+    return scanner.text, extract_first_json_object(scanner.text)
 
-def extract_eligibility_json_general(raw_text: str) -> dict:
-    prompt = f"""
+def build_eligibility_prompt(raw_text: str) -> str:
+    return f"""
 You are an intelligent assistant that extracts structured eligibility requirements from tender eligibility text.
 
 Respond only with a valid JSON object (no markdown, no explanation).
@@ -72,8 +86,51 @@ Eligibility Criteria Text:
 
 Respond only with the JSON.
 """
-    zephyr_response = query_self_hosted_zephyr(prompt)
+
+def is_complete_eligibility(parsed) -> bool:
+    """Whether a parse has the shape the prompt asks for (every expected top-level field)"""
+    return isinstance(parsed, dict) and all(field in parsed for field in ELIGIBILITY_FIELDS)
+
+def _store_if_complete(raw_text: str, parsed: dict):
+    if is_complete_eligibility(parsed):
+        store_cached_eligibility(raw_text, ELIGIBILITY_PROMPT_VERSION, parsed)
+    elif parsed:
+        missing = [field for field in ELIGIBILITY_FIELDS if field not in parsed]
+        print(f"⚠️ Parsed eligibility is missing {missing}; not caching it")
+
+def _report_zephyr_output(zephyr_response: str, parsed: dict) -> dict:
     print("📄 Raw Zephyr output:\n", zephyr_response)
-    parsed = extract_first_json_object(zephyr_response)
     print("✅ Final Parsed Output:\n", json.dumps(parsed, indent=2))
     return parsed
+
+def extract_eligibility_json_general(raw_text: str) -> dict:
+    cached = get_cached_eligibility(raw_text, ELIGIBILITY_PROMPT_VERSION)
+    if is_complete_eligibility(cached):
+        print("♻️ Reusing parsed eligibility for identical text")
+        return cached
+
+    prompt = build_eligibility_prompt(raw_text)
+    if ZEPHYR_STREAMING:
+        zephyr_response, parsed = query_zephyr_json(prompt)
+    else:
+        zephyr_response = query_self_hosted_zephyr(prompt)
+        parsed = extract_first_json_object(zephyr_response)
+    _report_zephyr_output(zephyr_response, parsed)
+    _store_if_complete(raw_text, parsed)
+    return parsed
+
+async def extract_eligibility_json_general_async(raw_text: str) -> dict:
+    cached = await asyncio.to_thread(get_cached_eligibility, raw_text, ELIGIBILITY_PROMPT_VERSION)
+    if is_complete_eligibility(cached):
+        print("♻️ Reusing parsed eligibility for identical text")
+        return cached
+
+    prompt = build_eligibility_prompt(raw_text)
+    if ZEPHYR_STREAMING:
+        zephyr_response, parsed = await query_zephyr_json_async(prompt)
+    else:
+        zephyr_response = await query_self_hosted_zephyr_async(prompt)
+        parsed = extract_first_json_object(zephyr_response)
+    _report_zephyr_output(zephyr_response, parsed)
+    await asyncio.to_thread(_store_if_complete, raw_text, parsed)
+    return parsed
@@ -0,0 +1,277 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.model_registry import DEFAULT_MODEL_NAME, get_model
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX platforms: the disk tier is then single-process only
+    fcntl = None
+
+# In-memory LRU tier, entries per model
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+# On-disk tier; unset disables it
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")
+EMBEDDING_CACHE_DISK_CAPACITY = int(os.getenv("EMBEDDING_CACHE_DISK_CAPACITY", "200000"))
+# Only short strings (names, labels, categories) are worth caching
+MAX_CACHED_TEXT_LENGTH = int(os.getenv("EMBEDDING_CACHE_MAX_TEXT_LENGTH", "256"))
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    """Content address of a text under a given model"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+class DiskEmbeddingStore:
+    """
+    Append-only vector store shared by every process on the host.
+
+    Vectors live in a fixed-capacity memory-mapped float32 file; keys.txt holds one
+    key per line, and a key's line number is its row. A vector is written before its
+    key, so any key a reader sees is backed by a complete vector.
+    """
+
+    def __init__(self, directory: str, dimension: int, capacity: int):
+        os.makedirs(directory, exist_ok=True)
+        self.dimension = dimension
+        self.capacity = capacity
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.keys_path = os.path.join(directory, "keys.txt")
+        self.lock_path = os.path.join(directory, "store.lock")
+        self.meta_path = os.path.join(directory, "dimension.txt")
+
+        self.rows: Dict[str, int] = {}
+        self._keys_offset = 0
+        self._lock = threading.Lock()
+
+        with self._file_lock():
+            mode = "r+" if os.path.exists(self.vectors_path) else "w+"
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode=mode, shape=(capacity, dimension))
+            if not os.path.exists(self.keys_path):
+                open(self.keys_path, "a").close()
+            with open(self.meta_path, "w") as fh:
+                fh.write(str(dimension))
+            self._refresh()
+
+    @staticmethod
+    def stored_dimension(directory: str) -> Optional[int]:
+        """Dimension of an existing store in directory, or None if there is none"""
+        try:
+            with open(os.path.join(directory, "dimension.txt")) as fh:
+                return int(fh.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _file_lock(self):
+        return _FileLock(self.lock_path)
+
+    def _refresh(self):
+        """Pick up keys appended by other processes since the last read"""
+        with open(self.keys_path, "r", encoding="utf-8") as fh:
+            fh.seek(self._keys_offset)
+            for line in fh:
+                if not line.endswith("\n"):
+                    break
+                self.rows.setdefault(line.rstrip("\n"), len(self.rows))
+                self._keys_offset += len(line.encode("utf-8"))
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            if any(key not in self.rows for key in keys):
+                self._refresh()
+            return {key: np.array(self.vectors[self.rows[key]]) for key in keys if key in self.rows}
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        with self._lock, self._file_lock():
+            self._refresh()
+            new_keys = []
+            for key, vector in items.items():
+                if key in self.rows:
+                    continue
+                row = len(self.rows)
+                if row >= self.capacity:
+                    break
+                self.vectors[row] = vector
+                self.rows[key] = row
+                new_keys.append(key)
+
+            if new_keys:
+                self.vectors.flush()
+                data = "".join(f"{key}\n" for key in new_keys)
+                with open(self.keys_path, "a", encoding="utf-8") as fh:
+                    fh.write(data)
+                self._keys_offset += len(data.encode("utf-8"))
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class _FileLock:
+    """Exclusive advisory lock across processes (no-op without fcntl)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fh = open(self.path, "a")
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fh is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache for one model: a bounded in-memory LRU in front
+    of an optional on-disk store, in front of model.encode. Vectors are L2-normalized.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        max_entries: int = EMBEDDING_CACHE_SIZE,
+        disk_dir: Optional[str] = EMBEDDING_CACHE_DIR,
+        disk_capacity: int = EMBEDDING_CACHE_DISK_CAPACITY
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_capacity = disk_capacity
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._disk: Optional[DiskEmbeddingStore] = None
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "uncached": 0}
+
+    def _disk_store(self, dimension: Optional[int] = None) -> Optional[DiskEmbeddingStore]:
+        """Open the disk tier; without a dimension only an existing store is opened"""
+        if not self.disk_dir:
+            return None
+        if self._disk is None:
+            directory = os.path.join(self.disk_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", self.model_name))
+            dimension = dimension or DiskEmbeddingStore.stored_dimension(directory)
+            if dimension is None:
+                return None
+            try:
+                self._disk = DiskEmbeddingStore(directory, dimension, self.disk_capacity)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Embedding disk cache disabled: {e}")
+                self.disk_dir = None
+        return self._disk
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Return an (n, dimension) array of normalized embeddings for texts"""
+        texts = [str(text) for text in texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        found: Dict[str, np.ndarray] = {}
+        keys = {text: embedding_key(self.model_name, text) for text in set(texts)}
+        cacheable = [text for text in keys if len(text) <= MAX_CACHED_TEXT_LENGTH]
+
+        with self._lock:
+            for text in cacheable:
+                vector = self._memory.get(keys[text])
+                if vector is not None:
+                    self._memory.move_to_end(keys[text])
+                    found[text] = vector
+                    self.counters["memory_hits"] += 1
+
+        pending = [text for text in cacheable if text not in found]
+        store = self._disk_store() if pending else None
+        if store is not None:
+            disk_hits = store.get_many([keys[text] for text in pending])
+            with self._lock:
+                for text in pending:
+                    vector = disk_hits.get(keys[text])
+                    if vector is not None:
+                        found[text] = vector
+                        self._remember(keys[text], vector)
+                        self.counters["disk_hits"] += 1
+
+        to_encode = [text for text in keys if text not in found]
+        if to_encode:
+            encoded = get_model(self.model_name).encode(
+                to_encode, normalize_embeddings=True, convert_to_numpy=True
+            ).astype(np.float32)
+            new_entries = {}
+            with self._lock:
+                for text, vector in zip(to_encode, encoded):
+                    found[text] = vector
+                    if len(text) <= MAX_CACHED_TEXT_LENGTH:
+                        self._remember(keys[text], vector)
+                        new_entries[keys[text]] = vector
+                        self.counters["misses"] += 1
+                    else:
+                        self.counters["uncached"] += 1
+
+            store = self._disk_store(encoded.shape[1])
+            if store is not None and new_entries:
+                try:
+                    store.put_many(new_entries)
+                except OSError as e:
+                    print(f"⚠️ Could not write embedding disk cache: {e}")
+
+        return np.stack([found[text] for text in texts])
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            memory_entries = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        return {
+            "model_name": self.model_name,
+            **counters,
+            "hit_rate": round((counters["memory_hits"] + counters["disk_hits"]) / lookups, 4) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "memory_capacity": self.max_entries,
+            "disk_entries": len(self._disk) if self._disk is not None else 0,
+            "disk_enabled": bool(self.disk_dir)
+        }
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str = DEFAULT_MODEL_NAME) -> EmbeddingCache:
+    """Return the process-wide cache for model_name"""
+    with _caches_lock:
+        cache = _caches.get(model_name)
+        if cache is None:
+            cache = _caches[model_name] = EmbeddingCache(model_name)
+        return cache
+
+
+def embed_texts(texts, model_name: str = DEFAULT_MODEL_NAME) -> np.ndarray:
+    """
+    Normalized embeddings for a string (1-D result) or a list of strings (2-D result), through the cache.
+    """
+    if isinstance(texts, str):
+        return get_embedding_cache(model_name).encode([texts])[0]
+    return get_embedding_cache(model_name).encode(list(texts))
+
+
+def get_embedding_cache_stats() -> dict:
+    """Hit/miss counters and sizes of every embedding cache in this process"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {"caches": [cache.stats() for cache in caches]}
@@ -1,8 +1,6 @@
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
 import numpy as np
-
-# Load lightweight model for field mapping
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from services.embedding_cache import embed_texts
 
 def map_fields_by_embedding(gemini_fields: list, backend_fields: list, backend_data: dict, threshold: float = 0.5):
     """
@@ -24,7 +22,7 @@ def map_fields_by_embedding(gemini_fields: list, backend_fields: list, backend_d
 
     # Embed backend fields
     try:
-        backend_embeddings = model.encode(backend_fields, convert_to_tensor=True)
+        backend_embeddings = embed_texts(backend_fields)
     except Exception as e:
         print(f"❌ Error encoding backend fields: {e}")
         return mapped_data
@@ -35,7 +33,7 @@ def map_fields_by_embedding(gemini_fields: list, backend_fields: list, backend_d
 
         try:
             # Embed template field label/id
-            query_embedding = model.encode(label, convert_to_tensor=True)
+            query_embedding = embed_texts(label)
 
             # Compute cosine similarities
             cosine_scores = util.cos_sim(query_embedding, backend_embeddings)[0].cpu().numpy()
@@ -89,7 +87,7 @@ def map_fields_with_confidence(gemini_fields: list, backend_fields: list, backen
         return mapped_data, mapping_details
 
     try:
-        backend_embeddings = model.encode(backend_fields, convert_to_tensor=True)
+        backend_embeddings = embed_texts(backend_fields)
     except Exception as e:
         print(f"❌ Error encoding backend fields: {e}")
         return mapped_data, mapping_details
@@ -99,7 +97,7 @@ def map_fields_with_confidence(gemini_fields: list, backend_fields: list, backen
         label = field.get('label', field_id)
 
         try:
-            query_embedding = model.encode(label, convert_to_tensor=True)
+            query_embedding = embed_texts(label)
             cosine_scores = util.cos_sim(query_embedding, backend_embeddings)[0].cpu().numpy()
             max_score_idx = np.argmax(cosine_scores)
             max_score = cosine_scores[max_score_idx]
@@ -0,0 +1,314 @@
+# heading_matcher.py
+import re
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+patterns = [  # same as yours
+            r"eligibility criteria",
+            r"eligibility requirements",
+            r"eligibility conditions",
+            r"eligibility standards",
+            r"eligibility rules",
+            r"eligibility qualifications",
+            r"eligibility for participation",
+            r"eligibility for tender",
+            r"eligibility and pre-qualification",
+            r"eligibility & prequalification",
+            r"eligibility/prequalification",
+            r"qualification criteria",
+            r"qualification requirements",
+            r"qualification standards",
+            r"qualification rules",
+            r"qualification and experience",
+            r"minimum eligibility",
+            r"minimum qualification",
+            r"minimum eligibility requirements",
+            r"minimum qualification criteria",
+            r"pre-qualification criteria",
+            r"prequalification requirements",
+            r"pre-qualification standards",
+            r"pre-qualification conditions",
+            r"prequalification process",
+            r"pre-qualification evaluation",
+            r"prequalification of bidders",
+            r"prequalification requirements",
+            r"prequalification of suppliers",
+            r"conditions of participation",
+            r"participation criteria",
+            r"participation requirements",
+            r"tender participation eligibility",
+            r"bidder eligibility",
+            r"bidder qualification",
+            r"bidder pre-qualification",
+            r"submission requirements",
+            r"bid submission eligibility",
+            r"bidder eligibility criteria",
+            r"screening criteria",
+            r"eligibility and qualification criteria for participation in the tender",
+            r"screening of bidders",
+            r"evaluation criteria",
+            r"evaluation of qualification",
+            r"selection criteria",
+            r"selection requirements",
+            r"selection procedure",
+            r"assessment criteria",
+            r"compliance requirements",
+            r"qualification and compliance",
+            r"experience and qualifications",
+            r"technical eligibility",
+            r"financial eligibility",
+            r"legal eligibility",
+            r"vendor eligibility",
+            r"supplier eligibility",
+            r"contractor eligibility",
+            r"applicant eligibility",
+            r"eligibility of tenderers",
+            r"eligibility of bidders",
+            r"bidding eligibility",
+            r"eligibility & pre-qualification",
+            r"eligibility/prequalification",
+            r"pre-qual & eligibility",
+            r"eligibility & qualification",
+            r"eligibility/qualification criteria",
+            r"eligibility",
+            r"qualification",
+            r"pre-qualification",
+            r"prequalification",
+            r"pre qualification",
+            r"pre-qualifications",
+            r"prequalifications",
+            r"pre qualifications"
+        ]
+
+HEADING_ROLES = ("title", "sectionHeading")
+REGEX_METACHARACTERS = set(".^$*+?{}[]\\|()")
+
+HEADING_MAX_LENGTH = 120
+# An upper-case line needs this many words of 3+ letters to be a heading, unless it names eligibility,
+# so "GST", "PAN" or "EMD" on a line of their own inside the section do not end it
+HEADING_MIN_WORDS = 2
+# Outline numbering opening a text-layer line: an optional "Section"-style word, then arabic numbers
+# ("4", "4.2", "4.") or a Roman numeral / capital letter followed by "." or ")"
+NUMBERED_HEADING = re.compile(
+    r"^(?:((?i:section|chapter|part|clause))\s*)?(?:([0-9]+(?:\.[0-9]+)*)([.)]?)|([IVXLC]+|[A-Z])([.)]))\s+(?=\S)"
+)
+# Bullets and "(a)"-style markers open list items, never headings
+LIST_MARKER = re.compile(r"^(?:[-\u2013\u2022*\u00b7\u25aa\u25cf\u25cb]|\(\s*[0-9A-Za-z]{1,4}\s*\))\s*")
+SMALL_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with", "&", "/"}
+# Lines made mostly of numbers and these ("2 Years", "10 Crore Turnover") are table cells, not headings
+QUANTITY_WORDS = {
+    "year", "years", "yrs", "month", "months", "day", "days", "crore", "crores", "cr", "lakh", "lakhs",
+    "lac", "lacs", "rs", "inr", "percent", "nos", "kg", "mt", "km"
+}
+
+
+class HeadingMatch(NamedTuple):
+    pattern: str
+    priority: int  # rank by specificity (longer patterns first, then list order); lower is more specific
+
+
+class Section(NamedTuple):
+    index: int  # paragraph holding the heading
+    start: int  # first paragraph of the section body
+    end: int  # one past the last paragraph of the body
+    match: Optional[HeadingMatch]  # None for headings that are not about eligibility
+
+
+class Outline(NamedTuple):
+    style: str  # numbering kind with its prefix word and delimiter, e.g. "arabic.", "section arabic", "roman)"
+    numbers: Tuple[int, ...]  # (4, 2) for "4.2"; Roman numerals and letters as a single number
+    end: int  # offset of the heading text after the numbering
+
+
+def _trie_regex(words: List[str]) -> str:
+    """
+    A regex alternation of literal words with shared prefixes factored out, e.g.
+    ["pre-qual", "prequal"] -> "pre(?:\\-qual|qual)", so each text position is
+    rejected after a character or two instead of being tried against every word.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node) -> str:
+        alternatives = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+        optional = "" in node
+        if len(alternatives) == 1 and not optional:
+            return alternatives[0]
+        # A word that ends here makes the rest optional; the greedy ? still prefers the longer word
+        group = "(?:" + "|".join(alternatives) + ")"
+        return group + "?" if optional else group
+
+    return emit(trie)
+
+
+# Duplicates in patterns are dropped; order is kept
+_unique_patterns = list(dict.fromkeys(patterns))
+# Most specific first: "minimum eligibility requirements" outranks "minimum eligibility" and "eligibility requirements"
+_ranked_patterns = sorted(_unique_patterns, key=len, reverse=True)
+_literals = [p.lower() for p in _unique_patterns if not REGEX_METACHARACTERS & set(p)]
+_regexes = [p for p in _unique_patterns if REGEX_METACHARACTERS & set(p)]
+# Every pattern in one expression for a yes/no answer in a single scan: literal patterns (all of
+# the current list) as a prefix trie, anything using regex syntax as plain alternatives
+_heading_regex = re.compile("|".join([_trie_regex(_literals)] * bool(_literals) + _regexes), re.IGNORECASE)
+# A group per pattern, most specific first, inside a lookahead, so every start position is tried
+# (matches may overlap) and lastindex names the most specific pattern starting there
+_priority_regex = re.compile("(?=" + "|".join(f"({pattern})" for pattern in _ranked_patterns) + ")", re.IGNORECASE)
+
+
+def match_eligibility_heading(text: str) -> Optional[HeadingMatch]:
+    """The most specific pattern found in text, or None"""
+    if not _heading_regex.search(text):
+        return None
+    best = None
+    for found in _priority_regex.finditer(text):
+        priority = found.lastindex - 1
+        if best is None or priority < best:
+            best = priority
+            if best == 0:
+                break
+    if best is None:
+        return None
+    return HeadingMatch(_ranked_patterns[best], best)
+
+
+def is_eligibility_heading(text):
+    return _heading_regex.search(text) is not None
+
+
+def build_section_index(paragraphs: List[dict]) -> List[Section]:
+    """
+    Every heading (by role) with the span of its section body, in one pass.
+
+    A section runs from the paragraph after the heading to the next heading or
+    the end of the document; match tells whether (and how specifically) the
+    heading is about eligibility. Paragraphs are {content, role} dicts.
+    """
+    sections = []
+    previous = None
+    for position, paragraph in enumerate(paragraphs):
+        if paragraph.get("role") in HEADING_ROLES:
+            if previous is not None:
+                sections.append(Section(previous, previous + 1, position, match_eligibility_heading(paragraphs[previous]["content"])))
+            previous = position
+    if previous is not None:
+        sections.append(Section(previous, previous + 1, len(paragraphs), match_eligibility_heading(paragraphs[previous]["content"])))
+    return sections
+
+
+def find_eligibility_section(paragraphs: List[dict], headings_only: bool = False) -> Optional[Section]:
+    """
+    The first heading about eligibility, or else (unless headings_only) the first
+    paragraph mentioning it, with the span up to the next heading.
+    """
+    sections = build_section_index(paragraphs)
+    for section in sections:
+        if section.match:
+            return section
+    if headings_only:
+        return None
+
+    heading_positions = [section.index for section in sections]
+    for position, paragraph in enumerate(paragraphs):
+        if is_eligibility_heading(paragraph["content"]):
+            following = bisect_right(heading_positions, position)
+            end = heading_positions[following] if following < len(heading_positions) else len(paragraphs)
+            return Section(position, position + 1, end, match_eligibility_heading(paragraph["content"]))
+    return None
+
+
+def _roman_value(numeral: str) -> int:
+    values = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100}
+    total = 0
+    for char, following in zip(numeral, numeral[1:] + " "):
+        value = values[char]
+        total += -value if value < values.get(following, 0) else value
+    return total
+
+
+def heading_outline(line: str) -> Optional[Outline]:
+    """
+    The outline numbering opening a line, or None. A lone arabic number with no
+    delimiter or prefix word ("2 Years") is a quantity, not numbering. Single
+    letters are letters, except "I" which starts a Roman list.
+    """
+    found = NUMBERED_HEADING.match(line)
+    if not found:
+        return None
+    prefix, arabic, arabic_delimiter, other, other_delimiter = found.groups()
+    prefix = f"{prefix.lower()} " if prefix else ""
+    if arabic is not None:
+        if not (prefix or arabic_delimiter or "." in arabic):
+            return None
+        return Outline(f"{prefix}arabic{arabic_delimiter}", tuple(int(part) for part in arabic.split(".")), found.end())
+    if len(other) > 1 or other == "I":
+        return Outline(f"{prefix}roman{other_delimiter}", (_roman_value(other),), found.end())
+    return Outline(f"{prefix}letter{other_delimiter}", (ord(other) - ord("A") + 1,), found.end())
+
+
+def is_heading_line(line: str) -> bool:
+    """
+    Guess whether a line of a PDF text layer is a heading: mostly upper case with
+    at least HEADING_MIN_WORDS words (or an eligibility heading), or numbered and
+    title-cased. List items and lines of mostly numbers and units never are.
+    """
+    line = line.strip()
+    if len(line) < 3 or len(line) > HEADING_MAX_LENGTH or line.endswith((".", ",", ";")) or LIST_MARKER.match(line):
+        return False
+
+    outline = heading_outline(line)
+    body = line[outline.end:] if outline else line
+    tokens = re.findall(r"[0-9][0-9.,]*|[A-Za-z]+|%", body)
+    quantities = sum(token[0].isdigit() or token == "%" or token.lower() in QUANTITY_WORDS for token in tokens)
+    if not tokens or quantities * 2 >= len(tokens):
+        return False
+
+    letters = [c for c in body if c.isalpha()]
+    if len(letters) >= 3 and sum(c.isupper() for c in letters) / len(letters) >= 0.7:
+        words = [w for w in re.findall(r"[A-Za-z]{3,}", body) if w.lower() not in SMALL_WORDS]
+        return len(words) >= HEADING_MIN_WORDS or is_eligibility_heading(line)
+
+    if outline:
+        words = [w for w in re.findall(r"[A-Za-z][A-Za-z'-]*", body) if w.lower() not in SMALL_WORDS]
+        return 0 < len(words) <= 10 and sum(w[0].isupper() for w in words) / len(words) >= 0.6
+    return False
+
+
+def _ends_outline_section(heading: Optional[Outline], outline: Optional[Outline], last_numbers: Dict[tuple, int]) -> bool:
+    """Whether a heading line is at the same or a higher level than the section's heading"""
+    if heading is None:
+        return outline is None
+    if outline is None or outline.style != heading.style:
+        return False
+    if outline.numbers[:len(heading.numbers)] <= heading.numbers:
+        return False
+    # "5." right after a nested "4." continues that list rather than following the section heading
+    return last_numbers.get((outline.style, len(outline.numbers))) != outline.numbers[-1] - 1
+
+
+def find_local_eligibility_section(paragraphs: List[dict]) -> Optional[Section]:
+    """
+    find_eligibility_section(headings_only=True) for text-layer lines, whose
+    heading roles are guesses: the section ends only at a heading of the same or
+    a higher level than the eligibility heading, so "4. ELIGIBILITY CRITERIA" is
+    ended by "5. ..." but not by its own "1. Average Annual Turnover" or
+    "GST REGISTRATION CERTIFICATE". An unnumbered eligibility heading is ended
+    by the next unnumbered heading.
+    """
+    section = find_eligibility_section(paragraphs, headings_only=True)
+    if section is None:
+        return None
+    heading = heading_outline(paragraphs[section.index]["content"].strip())
+    last_numbers = {}
+    for position in range(section.start, len(paragraphs)):
+        outline = heading_outline(paragraphs[position]["content"].strip())
+        if paragraphs[position].get("role") in HEADING_ROLES and _ends_outline_section(heading, outline, last_numbers):
+            return section._replace(end=position)
+        if outline:
+            last_numbers[(outline.style, len(outline.numbers))] = outline.numbers[-1]
+    return section._replace(end=len(paragraphs))
@@ -0,0 +1,90 @@
+import json
+from typing import List, Optional
+
+_decoder = json.JSONDecoder()
+
+
+def _repair_json(text: str) -> str:
+    """Insert the commas Zephyr tends to drop between adjacent objects/keys"""
+    return text.replace("}\n{", "},\n{").replace("}\n\"", "},\n\"")
+
+
+def _decode_object(candidate: str) -> Optional[dict]:
+    """The balanced candidate as a JSON object (retrying once with dropped commas restored), or None"""
+    for text in (candidate, _repair_json(candidate)):
+        try:
+            parsed, _ = _decoder.raw_decode(text)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    return None
+
+
+class JsonObjectScanner:
+    """
+    Finds the first complete top-level JSON object in text fed piece by piece.
+
+    Brace depth and string/escape state carry over between chunks, so every
+    character is looked at once and only a balanced candidate is decoded. A
+    candidate that does not decode is skipped and scanning moves on to the next
+    top-level object.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._length = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> Optional[dict]:
+        """Add a chunk; returns the object once its closing brace arrives"""
+        offset = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                # Quotes in prose before the object do not open a string
+                self._in_string = self._start is not None
+            elif ch == "{":
+                if self._start is None:
+                    self._start = offset + i
+                self._depth += 1
+            elif ch == "}" and self._start is not None:
+                self._depth -= 1
+                if self._depth == 0:
+                    start, self._start = self._start, None
+                    parsed = _decode_object(self.text[start:offset + i + 1])
+                    if parsed is not None:
+                        return parsed
+        return None
+
+
+def extract_first_json_object(text: str) -> dict:
+    """First JSON object in LLM output, tolerating code fences, surrounding prose and dropped commas; {} if none"""
+    if "```json" in text:
+        text = text.split("```json", 1)[1].split("```", 1)[0].strip()
+    elif "```" in text:
+        text = text.split("```", 1)[1].split("```", 1)[0].strip()
+
+    text = _repair_json(text)
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    return JsonObjectScanner().feed(text) or {}
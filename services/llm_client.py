@@ -0,0 +1,305 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from typing import AsyncIterator, Iterator, List, Optional
+
+import httpx
+
+# Self-hosted Zephyr endpoint: POST {"prompt", "max_tokens"} -> {"response"}; with "stream" it may answer
+# with text/event-stream, NDJSON or chunked text instead
+ZEPHYR_API_URL = os.getenv("ZEPHYR_API_URL", "http://34.60.71.140:8000/search")
+ZEPHYR_MAX_TOKENS = int(os.getenv("ZEPHYR_MAX_TOKENS", "768"))
+ZEPHYR_CONNECT_TIMEOUT = float(os.getenv("ZEPHYR_CONNECT_TIMEOUT", "5"))
+ZEPHYR_READ_TIMEOUT = float(os.getenv("ZEPHYR_READ_TIMEOUT", "120"))
+ZEPHYR_MAX_RETRIES = int(os.getenv("ZEPHYR_MAX_RETRIES", "2"))
+ZEPHYR_BACKOFF_SECONDS = float(os.getenv("ZEPHYR_BACKOFF_SECONDS", "0.5"))
+# Requests in flight per client (i.e. per process)
+ZEPHYR_CONCURRENCY = int(os.getenv("ZEPHYR_CONCURRENCY", "2"))
+# Ask the server to stream tokens; a server that ignores the flag and answers with the
+# {"response"} envelope still works, whatever content type it sends
+ZEPHYR_STREAMING = os.getenv("ZEPHYR_STREAMING", "true").lower() == "true"
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMRequestError(Exception):
+    """Raised when the LLM endpoint keeps failing after every retry"""
+
+
+def _retry_delay(attempt: int, backoff: float) -> float:
+    """Exponential backoff with jitter"""
+    return backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}"
+    return f"{type(error).__name__}: {error}"
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, httpx.TimeoutException))
+
+
+def _event_text(data: str) -> str:
+    """Token text of one SSE/NDJSON event: JSON with token/text/response, a JSON string, or the raw data"""
+    if data == "[DONE]":
+        return ""
+    try:
+        event = json.loads(data)
+    except ValueError:
+        return data
+    if isinstance(event, dict):
+        return event.get("token") or event.get("text") or event.get("response") or ""
+    return event if isinstance(event, str) else data
+
+
+class _StreamDecoder:
+    """
+    Generated text from a streamed response body, whatever the server labelled it:
+    SSE events, NDJSON events, plain text tokens or, from a server that ignored
+    "stream", a single {"response": ...} envelope (recognised by its first key
+    even without a JSON content type).
+    """
+
+    _ENVELOPE = re.compile(r'\s*\{\s*"(?P<key>[^"\\]*)"')
+    _UNDECIDED_LIMIT = 64
+
+    def __init__(self, content_type: str):
+        if "event-stream" in content_type:
+            self.mode = "sse"
+        elif "ndjson" in content_type:
+            self.mode = "ndjson"
+        elif "json" in content_type:
+            self.mode = "envelope"
+        else:
+            self.mode = None  # plain text or an unlabelled envelope: decided by the first characters
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        if self.mode is None:
+            self._decide()
+        if self.mode == "text":
+            text, self._buffer = self._buffer, ""
+            return [text] if text else []
+        if self.mode in ("sse", "ndjson"):
+            *lines, self._buffer = self._buffer.split("\n")
+            return self._events(lines)
+        return []
+
+    def finish(self) -> List[str]:
+        text, self._buffer = self._buffer, ""
+        if self.mode in (None, "text"):
+            return [text] if text else []
+        if self.mode == "envelope":
+            try:
+                body = json.loads(text)
+            except ValueError:
+                # An undeclared stream of {"response": token} lines
+                return self._events(text.split("\n"))
+            if isinstance(body, dict):
+                response = body.get("response")
+                return [response] if isinstance(response, str) and response else []
+            return [text]
+        return self._events([text])
+
+    def _decide(self):
+        stripped = self._buffer.lstrip()
+        if not stripped:
+            return
+        if not stripped.startswith("{"):
+            self.mode = "text"
+            return
+        match = self._ENVELOPE.match(self._buffer)
+        if match:
+            self.mode = "envelope" if match.group("key") == "response" else "text"
+        elif len(self._buffer) > self._UNDECIDED_LIMIT:
+            self.mode = "text"
+
+    def _events(self, lines: List[str]) -> List[str]:
+        pieces = []
+        for line in lines:
+            line = line.rstrip("\r")
+            if self.mode == "sse":
+                if not line.startswith("data:"):
+                    continue
+                line = line[5:].strip()
+            elif not line.strip():
+                continue
+            piece = _event_text(line)
+            if piece:
+                pieces.append(piece)
+        return pieces
+
+
+class _ZephyrSettings:
+    def __init__(
+        self,
+        url: str = ZEPHYR_API_URL,
+        max_tokens: int = ZEPHYR_MAX_TOKENS,
+        connect_timeout: float = ZEPHYR_CONNECT_TIMEOUT,
+        read_timeout: float = ZEPHYR_READ_TIMEOUT,
+        max_retries: int = ZEPHYR_MAX_RETRIES,
+        backoff: float = ZEPHYR_BACKOFF_SECONDS,
+        concurrency: int = ZEPHYR_CONCURRENCY
+    ):
+        self.url = url
+        self.max_tokens = max_tokens
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+
+    def payload(self, prompt: str, max_tokens: Optional[int], stream: bool = False) -> dict:
+        payload = {"prompt": prompt, "max_tokens": max_tokens or self.max_tokens}
+        if stream:
+            payload["stream"] = True
+        return payload
+
+
+class ZephyrClient(_ZephyrSettings):
+    """
+    Pooled, retrying client for the Zephyr endpoint, safe to share between threads.
+
+    At most `concurrency` requests are in flight; each has connect/read timeouts
+    and is retried up to max_retries times on transport errors, timeouts and
+    retryable statuses.
+    """
+
+    def __init__(self, **settings):
+        super().__init__(**settings)
+        self._client = httpx.Client(timeout=self.timeout, limits=self.limits)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def complete(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        """Generated text for prompt; raises LLMRequestError once retries are exhausted"""
+        payload = self.payload(prompt, max_tokens)
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    response = self._client.post(self.url, json=payload)
+                    response.raise_for_status()
+                    return response.json().get("response", "")
+            except (httpx.HTTPError, ValueError) as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise LLMRequestError(f"Zephyr request failed after {attempt + 1} attempt(s): {_describe(e)}") from e
+                delay = _retry_delay(attempt, self.backoff)
+                print(f"⚠️ Zephyr request failed ({_describe(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def stream_complete(self, prompt: str, max_tokens: Optional[int] = None) -> Iterator[str]:
+        """
+        Yield generated text as it arrives. Closing the generator early closes the
+        connection, which ends generation on the server. Opening the stream is
+        retried like complete(); failures after the first chunk are not.
+        """
+        payload = self.payload(prompt, max_tokens, stream=True)
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                with self._slots, self._client.stream("POST", self.url, json=payload) as response:
+                    response.raise_for_status()
+                    decoder = _StreamDecoder(response.headers.get("content-type", ""))
+                    for text in response.iter_text():
+                        for piece in decoder.feed(text):
+                            started = True
+                            yield piece
+                    for piece in decoder.finish():
+                        started = True
+                        yield piece
+                return
+            except (httpx.HTTPError, ValueError) as e:
+                if started or attempt >= self.max_retries or not _is_retryable(e):
+                    raise LLMRequestError(f"Zephyr stream failed after {attempt + 1} attempt(s): {_describe(e)}") from e
+                delay = _retry_delay(attempt, self.backoff)
+                print(f"⚠️ Zephyr stream failed ({_describe(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def close(self):
+        self._client.close()
+
+
+class AsyncZephyrClient(_ZephyrSettings):
+    """asyncio counterpart of ZephyrClient; use one instance per event loop"""
+
+    def __init__(self, **settings):
+        super().__init__(**settings)
+        self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        self._slots = asyncio.Semaphore(self.concurrency)
+
+    async def complete(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        payload = self.payload(prompt, max_tokens)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._slots:
+                    response = await self._client.post(self.url, json=payload)
+                    response.raise_for_status()
+                    return response.json().get("response", "")
+            except (httpx.HTTPError, ValueError) as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise LLMRequestError(f"Zephyr request failed after {attempt + 1} attempt(s): {_describe(e)}") from e
+                delay = _retry_delay(attempt, self.backoff)
+                print(f"⚠️ Zephyr request failed ({_describe(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def stream_complete(self, prompt: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """asyncio counterpart of ZephyrClient.stream_complete"""
+        payload = self.payload(prompt, max_tokens, stream=True)
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self._slots:
+                    async with self._client.stream("POST", self.url, json=payload) as response:
+                        response.raise_for_status()
+                        decoder = _StreamDecoder(response.headers.get("content-type", ""))
+                        async for text in response.aiter_text():
+                            for piece in decoder.feed(text):
+                                started = True
+                                yield piece
+                        for piece in decoder.finish():
+                            started = True
+                            yield piece
+                return
+            except (httpx.HTTPError, ValueError) as e:
+                if started or attempt >= self.max_retries or not _is_retryable(e):
+                    raise LLMRequestError(f"Zephyr stream failed after {attempt + 1} attempt(s): {_describe(e)}") from e
+                delay = _retry_delay(attempt, self.backoff)
+                print(f"⚠️ Zephyr stream failed ({_describe(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: Optional[ZephyrClient] = None
+_client_lock = threading.Lock()
+
+
+def get_zephyr_client() -> ZephyrClient:
+    """Process-wide Zephyr client configured from the environment"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ZephyrClient()
+        return _client
+
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncZephyrClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_zephyr_client() -> AsyncZephyrClient:
+    """Zephyr client for the running event loop (asyncio primitives are bound to one loop)"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncZephyrClient()
+    return client
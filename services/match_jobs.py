@@ -0,0 +1,326 @@
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from core.database import db
+from services.match_pipeline import run_match_pipeline, MatchCancelled
+
+match_jobs = db.get_collection("match_jobs")
+
+# Matching runs on its own small pool so long Azure/Zephyr calls never tie up the request threadpool
+MATCH_JOB_WORKERS = int(os.getenv("MATCH_JOB_WORKERS", "2"))
+# Jobs accepted by this process but not yet finished; beyond this new submissions are refused
+MATCH_JOB_MAX_PENDING = int(os.getenv("MATCH_JOB_MAX_PENDING", "50"))
+# A job whose heartbeat is older than this is treated as dead (e.g. the worker restarted).
+# Running jobs heartbeat on progress; queued ones are heartbeated by their process while they wait.
+MATCH_JOB_STALE_SECONDS = int(os.getenv("MATCH_JOB_STALE_SECONDS", "900"))
+# Finished job documents are removed by Mongo after this long
+MATCH_JOB_TTL_HOURS = int(os.getenv("MATCH_JOB_TTL_HOURS", "24"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+try:
+    match_jobs.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+    match_jobs.create_index("created_at", expireAfterSeconds=MATCH_JOB_TTL_HOURS * 3600)
+    # "active" is set only while a job is queued or running: at most one such job per user
+    match_jobs.create_index(
+        [("user_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"active": True},
+        name="one_active_job_per_user"
+    )
+except PyMongoError as e:
+    print(f"Error creating match job indexes: {str(e)}")
+
+_executor = ThreadPoolExecutor(max_workers=MATCH_JOB_WORKERS, thread_name_prefix="match-job")
+_pending = 0
+_pending_lock = threading.Lock()
+# Jobs of this process still waiting for a worker, kept alive by _heartbeat_queued
+_queued: set = set()
+_queued_lock = threading.Lock()
+_heartbeat_thread: Optional[threading.Thread] = None
+
+
+class MatchJobQueueFull(Exception):
+    """Raised when this process already has MATCH_JOB_MAX_PENDING unfinished jobs"""
+
+
+class MatchJobConflict(Exception):
+    """Raised when a streamed run is requested while the user already has a live job"""
+
+    def __init__(self, job: dict):
+        super().__init__(f"Matching job {job['_id']} is already {job['status']}")
+        self.job = job
+
+
+def _is_stale(job: dict, now: Optional[datetime] = None) -> bool:
+    now = now or datetime.utcnow()
+    heartbeat = job.get("heartbeat_at") or job.get("created_at")
+    return heartbeat is None or now - heartbeat > timedelta(seconds=MATCH_JOB_STALE_SECONDS)
+
+
+def _heartbeat_queued():
+    """Refresh the heartbeat of this process's queued jobs so waiting for a worker never looks like death"""
+    while True:
+        time.sleep(MATCH_JOB_STALE_SECONDS / 3)
+        with _queued_lock:
+            job_ids = list(_queued)
+        if not job_ids:
+            continue
+        try:
+            match_jobs.update_many(
+                {"_id": {"$in": job_ids}, "status": "queued"},
+                {"$set": {"heartbeat_at": datetime.utcnow()}}
+            )
+        except PyMongoError as e:
+            print(f"⚠️ Could not heartbeat queued match jobs: {str(e)}")
+
+
+def _ensure_heartbeat():
+    global _heartbeat_thread
+    with _queued_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_queued, name="match-job-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+
+def _active_job(user_id: str) -> Optional[dict]:
+    """The user's queued/running job, if any, stale or not"""
+    return match_jobs.find_one({"user_id": user_id, "active": True})
+
+
+def _expire_job(job: dict):
+    """Mark a dead job failed, unless it heartbeated since we looked at it"""
+    match_jobs.update_one(
+        {"_id": job["_id"], "active": True, "heartbeat_at": job.get("heartbeat_at")},
+        {"$set": {"status": "failed", "finished_at": datetime.utcnow(),
+                  "error": job.get("error") or "Job stopped reporting progress"},
+         "$unset": {"active": ""}}
+    )
+
+
+def _mark_progress(job_id: str, stage: str, processed: int, total: int, new_matches: List[dict]):
+    update = {
+        "$set": {
+            "progress": {"stage": stage, "processed": processed, "total": total},
+            "heartbeat_at": datetime.utcnow()
+        }
+    }
+    if new_matches:
+        update["$push"] = {"matches": {"$each": [{k: v for k, v in doc.items() if k != "_id"} for doc in new_matches]}}
+    match_jobs.update_one({"_id": job_id}, update)
+
+
+def _run_job(
+    job_id: str,
+    company: dict,
+    threshold: float,
+    listener: Optional[Callable[[str, object], None]] = None,
+    cancel: Optional[threading.Event] = None
+):
+    """Run the pipeline for a job, recording progress and outcome; listener also receives each event"""
+    global _pending
+    with _queued_lock:
+        _queued.discard(job_id)
+
+    def notify(event: str, payload):
+        if listener:
+            listener(event, payload)
+
+    def on_progress(stage, processed, total, new_matches):
+        _mark_progress(job_id, stage, processed, total, new_matches)
+        notify("progress", {"stage": stage, "processed": processed, "total": total, "matches": new_matches})
+
+    try:
+        now = datetime.utcnow()
+        match_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "running", "started_at": now, "heartbeat_at": now,
+                      "progress": {"stage": "filtering", "processed": 0, "total": 0}}}
+        )
+        print(f"🚀 Match job {job_id} started for company {company['_id']}")
+
+        outcome = run_match_pipeline(company, threshold, on_progress=on_progress, cancel=cancel)
+
+        now = datetime.utcnow()
+        match_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {
+                "status": "completed",
+                "finished_at": now,
+                "heartbeat_at": now,
+                "progress": {"stage": "completed", "processed": outcome["total_filtered"], "total": outcome["total_filtered"]},
+                "total_filtered": outcome["total_filtered"],
+                "reused": outcome["reused"],
+                "recomputed": outcome["recomputed"],
+                "matches": [{k: v for k, v in doc.items() if k != "_id"} for doc in outcome["matches"]]
+            },
+             "$unset": {"active": ""}}
+        )
+        print(f"✅ Match job {job_id} completed: {len(outcome['matches'])} matches")
+        notify("done", outcome)
+    except MatchCancelled:
+        print(f"⏹️ Match job {job_id} cancelled")
+        try:
+            match_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "cancelled", "finished_at": datetime.utcnow()}, "$unset": {"active": ""}}
+            )
+        except PyMongoError as db_error:
+            print(f"Error recording match job cancellation: {str(db_error)}")
+    except Exception as e:
+        print(f"❌ Match job {job_id} failed: {str(e)}")
+        print(traceback.format_exc())
+        notify("error", str(e))
+        try:
+            match_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "failed", "finished_at": datetime.utcnow(), "error": str(e)},
+                 "$unset": {"active": ""}}
+            )
+        except PyMongoError as db_error:
+            print(f"Error recording match job failure: {str(db_error)}")
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+def _claim_job(company: dict, user_id: str, threshold: float, **run_options) -> Tuple[dict, bool]:
+    """
+    The user's live job, or a newly queued one: (job, created).
+
+    The unique one_active_job_per_user index makes this hold across concurrent
+    requests and workers; a stale holder is expired first.
+    """
+    while True:
+        existing = _active_job(user_id)
+        if existing and not _is_stale(existing):
+            return existing, False
+        if existing:
+            _expire_job(existing)
+        try:
+            return _insert_job(company, user_id, threshold, **run_options), True
+        except DuplicateKeyError:
+            # Another request created the user's job first; look again
+            continue
+
+
+def _insert_job(company: dict, user_id: str, threshold: float, **run_options) -> dict:
+    global _pending
+    with _pending_lock:
+        if _pending >= MATCH_JOB_MAX_PENDING:
+            raise MatchJobQueueFull(f"{_pending} matching jobs already pending")
+        _pending += 1
+
+    now = datetime.utcnow()
+    job = {
+        "_id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "company_id": str(company["_id"]),
+        "status": "queued",
+        "active": True,
+        "threshold": threshold,
+        "progress": {"stage": "queued", "processed": 0, "total": 0},
+        "matches": [],
+        "error": None,
+        "created_at": now,
+        "heartbeat_at": now,
+        "started_at": None,
+        "finished_at": None
+    }
+    try:
+        match_jobs.insert_one(job)
+    except Exception:
+        with _pending_lock:
+            _pending -= 1
+        raise
+
+    _ensure_heartbeat()
+    with _queued_lock:
+        _queued.add(job["_id"])
+    try:
+        _executor.submit(_run_job, job["_id"], company, threshold, **run_options)
+    except Exception as e:
+        with _pending_lock:
+            _pending -= 1
+        with _queued_lock:
+            _queued.discard(job["_id"])
+        match_jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "failed", "finished_at": datetime.utcnow(), "error": str(e)}, "$unset": {"active": ""}}
+        )
+        raise
+    return job
+
+
+def submit_match_job(company: dict, user_id: str, threshold: float = 60.0) -> dict:
+    """
+    Queue a matching run for a company and return its job document.
+
+    A user has at most one live job; submitting again while one is queued or
+    running returns that job instead of starting another.
+    """
+    job, _ = _claim_job(company, user_id, threshold)
+    return job
+
+
+def get_match_job(job_id: str) -> Optional[dict]:
+    """Job document with its matches sorted best first; dead jobs are reported as failed"""
+    job = match_jobs.find_one({"_id": job_id})
+    if not job:
+        return None
+    if job["status"] in ACTIVE_STATUSES and _is_stale(job):
+        job["status"] = "failed"
+        job["error"] = job.get("error") or "Job stopped reporting progress"
+    job["matches"] = sorted(job.get("matches", []), key=lambda doc: doc["matching_score"], reverse=True)
+    return job
+
+
+def start_match_events(company: dict, user_id: str, threshold: float = 60.0, keepalive_seconds: float = 15.0) -> Iterator[tuple]:
+    """
+    Queue a matching run for streaming and return an iterator over its events.
+
+    The run is admitted like submit_match_job (counted against
+    MATCH_JOB_MAX_PENDING, one live job per user) but eagerly, so the caller can
+    refuse the request before streaming: MatchJobQueueFull when the pool is full,
+    MatchJobConflict when the user already has a live job.
+
+    The iterator yields ("progress", {stage, processed, total, matches}) as the
+    run advances (matches being the ones scored since the previous event),
+    ("keepalive", None) while waiting, then either ("done", outcome) or
+    ("error", message). Closing it early cancels the run.
+    """
+    events = queue.Queue()
+    cancel = threading.Event()
+    job, created = _claim_job(
+        company, user_id, threshold,
+        listener=lambda event, payload: events.put((event, payload)),
+        cancel=cancel
+    )
+    if not created:
+        raise MatchJobConflict(job)
+    return _iter_events(events, cancel, keepalive_seconds)
+
+
+def _iter_events(events: queue.Queue, cancel: threading.Event, keepalive_seconds: float):
+    try:
+        while True:
+            try:
+                event = events.get(timeout=keepalive_seconds)
+            except queue.Empty:
+                yield "keepalive", None
+                continue
+            yield event
+            if event[0] in ("done", "error"):
+                return
+    finally:
+        cancel.set()
@@ -0,0 +1,300 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from core.database import db
+from services.basic_filter import filter_tenders
+from services.eligibility_extractor import extract_eligibility
+from services.document_layout import AZURE_DOC_INTEL_CONCURRENCY
+from services.llm_client import ZEPHYR_CONCURRENCY
+from services.eligibility_parser import extract_eligibility_json_general
+from services.tender_matcher import compute_tender_match_scores_batch
+from services.match_store import (
+    profile_version,
+    is_fresh,
+    get_stored_matches,
+    save_matches,
+    prune_matches
+)
+
+tenders = db.get_collection("filtered_tenders")
+
+# Tenders prepared in parallel by one pipeline run
+MATCH_PREPARE_WORKERS = int(os.getenv("MATCH_PREPARE_WORKERS", str(AZURE_DOC_INTEL_CONCURRENCY + ZEPHYR_CONCURRENCY)))
+
+# How long a process may hold a tender's extraction before others take it over
+ELIGIBILITY_LEASE_SECONDS = int(os.getenv("ELIGIBILITY_LEASE_SECONDS", "600"))
+ELIGIBILITY_LEASE_POLL_SECONDS = float(os.getenv("ELIGIBILITY_LEASE_POLL_SECONDS", "2"))
+
+
+class MatchCancelled(Exception):
+    """Raised by run_match_pipeline when its cancel event is set"""
+
+
+
+class _SingleFlight:
+    """Collapse concurrent calls for the same key in this process onto one execution"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, fn: Callable[[], dict]) -> dict:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["done"].set()
+
+
+_eligibility_flights = _SingleFlight()
+_lease_owner = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _acquire_lease(tender_id) -> bool:
+    """Claim a tender's eligibility extraction across processes; False if someone else holds it or it is done"""
+    now = datetime.utcnow()
+    claimed = tenders.find_one_and_update(
+        {
+            "_id": tender_id,
+            "structured_eligibility": {"$in": [None, {}]},
+            "$or": [
+                {"eligibility_lease": None},
+                {"eligibility_lease.expires_at": {"$lt": now}}
+            ]
+        },
+        {"$set": {"eligibility_lease": {
+            "owner": _lease_owner,
+            "expires_at": now + timedelta(seconds=ELIGIBILITY_LEASE_SECONDS)
+        }}},
+        projection={"_id": 1}
+    )
+    return claimed is not None
+
+
+def _release_lease(tender_id):
+    tenders.update_one(
+        {"_id": tender_id, "eligibility_lease.owner": _lease_owner},
+        {"$unset": {"eligibility_lease": ""}}
+    )
+
+
+def _eligibility_fields(tender_id) -> dict:
+    return tenders.find_one(
+        {"_id": tender_id},
+        {"_id": 0, "raw_eligibility": 1, "structured_eligibility": 1, "last_updated": 1, "eligibility_lease": 1}
+    ) or {}
+
+
+def _extract_and_parse(tender: dict) -> dict:
+    """Extract and parse whatever eligibility the tender is missing and store the results"""
+    fields = {}
+    form_url = tender.get("form_url")
+
+    raw_eligibility = tender.get("raw_eligibility")
+    if not raw_eligibility and form_url:
+        print(f"    Extracting eligibility from {form_url}")
+        extraction = extract_eligibility(form_url)
+        raw_eligibility = extraction["text"]
+        if raw_eligibility:
+            fields.update({
+                "raw_eligibility": raw_eligibility,
+                "eligibility_tier": extraction["tier"],
+                "last_updated": datetime.utcnow()
+            })
+            tenders.update_one({"_id": tender["_id"]}, {"$set": fields})
+
+    if raw_eligibility and not tender.get("structured_eligibility"):
+        print(f"    Parsing structured eligibility")
+        structured_eligibility = extract_eligibility_json_general(raw_eligibility)
+        if structured_eligibility:
+            update = {"structured_eligibility": structured_eligibility, "last_updated": datetime.utcnow()}
+            tenders.update_one({"_id": tender["_id"]}, {"$set": update})
+            fields.update(update)
+
+    return fields
+
+
+def _prepare_once(tender: dict) -> dict:
+    """
+    Extract and parse a tender's eligibility at most once across processes.
+
+    The caller holding the Mongo lease does the work; everyone else polls the
+    tender until the holder stores a result, releases the lease, or lets it expire
+    (in which case the lease is taken over).
+    """
+    tender_id = tender["_id"]
+    while True:
+        if _acquire_lease(tender_id):
+            try:
+                # Another holder may have finished between our read and the claim
+                current = _eligibility_fields(tender_id)
+                current.pop("eligibility_lease", None)
+                fields = _extract_and_parse({**tender, **current})
+                return {**current, **fields}
+            finally:
+                _release_lease(tender_id)
+
+        deadline = time.monotonic() + ELIGIBILITY_LEASE_SECONDS
+        while time.monotonic() < deadline:
+            current = _eligibility_fields(tender_id)
+            lease = current.pop("eligibility_lease", None)
+            if current.get("structured_eligibility") or not lease:
+                return current
+            if lease.get("expires_at") and lease["expires_at"] < datetime.utcnow():
+                break
+            time.sleep(ELIGIBILITY_LEASE_POLL_SECONDS)
+
+
+def prepare_eligibility(tender: dict) -> Optional[dict]:
+    """
+    Make sure a tender has raw and structured eligibility, extracting and parsing what is missing.
+
+    Results are written back to Mongo and onto the tender dict (including last_updated,
+    so the tender's match version stays in step with what was stored). Safe to call
+    from several threads; calls to Azure and Zephyr are capped per process by
+    AZURE_DOC_INTEL_CONCURRENCY and ZEPHYR_CONCURRENCY. Concurrent callers for the
+    same tender, in this process or any other, share a single extraction.
+    """
+    if tender.get("structured_eligibility"):
+        return tender["structured_eligibility"]
+    if not tender.get("raw_eligibility") and not tender.get("form_url"):
+        return None
+
+    fields = _eligibility_flights.do(str(tender["_id"]), lambda: _prepare_once(tender))
+    tender.update({k: v for k, v in fields.items() if v})
+    return tender.get("structured_eligibility") or None
+
+
+def _score_and_store(company: dict, company_profile_version: str, scorable: list) -> list:
+    """Score (tender, structured_eligibility) pairs in one batch and store the results"""
+    if not scorable:
+        return []
+    scores = compute_tender_match_scores_batch([eligibility for _, eligibility in scorable], company)
+    return save_matches(
+        company,
+        company_profile_version,
+        [(tender, eligibility, result) for (tender, eligibility), result in zip(scorable, scores)]
+    )
+
+
+def run_match_pipeline(
+    company: dict,
+    threshold: float = 60.0,
+    on_progress: Optional[Callable[[str, int, int, List[dict]], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> dict:
+    """
+    Filter, prepare and score tenders for one company, reusing stored matches.
+
+    Only (company, tender) pairs whose profile, tender or structured eligibility
+    changed since they were last scored are recomputed; the rest are served from
+    the matches collection. Stale tenders that already have structured eligibility
+    are scored in one batch; the ones that still need extraction are prepared
+    concurrently (MATCH_PREPARE_WORKERS) and scored as each one completes.
+    Stored matches for tenders that no longer pass the filter are pruned.
+
+    Args:
+        company: Company profile document
+        threshold: Minimum matching score to report
+        on_progress: Optional callback(stage, processed, total, new_matches) where
+            new_matches are match documents at or above threshold produced since
+            the previous call
+        cancel: Optional event; once set, the run stops at the next stage or
+            prepared tender (queued preparations are dropped) and raises MatchCancelled
+
+    Returns:
+        dict with total_filtered, reused, recomputed and matches (stored match
+        documents at or above threshold, best first)
+    """
+    def check_cancelled():
+        if cancel is not None and cancel.is_set():
+            raise MatchCancelled(f"Matching cancelled for company {company['_id']}")
+
+    def report(stage: str, processed: int, total: int, new_docs: List[dict]):
+        if on_progress:
+            on_progress(stage, processed, total, [doc for doc in new_docs if doc["matching_score"] >= threshold])
+        check_cancelled()
+
+    check_cancelled()
+    filtered = [t for t in filter_tenders(company) if t.get("form_url")]
+    company_id = str(company["_id"])
+    current_profile_version = profile_version(company)
+    tender_ids = [str(t["_id"]) for t in filtered]
+    stored = get_stored_matches(company_id, tender_ids)
+
+    docs, ready, pending = [], [], []
+    for tender in filtered:
+        doc = stored.get(str(tender["_id"]))
+        if is_fresh(doc, current_profile_version, tender):
+            docs.append(doc)
+        elif tender.get("structured_eligibility"):
+            ready.append((tender, tender["structured_eligibility"]))
+        else:
+            pending.append(tender)
+    reused = len(docs)
+    print(f"♻️ Reusing {reused} stored matches, rescoring {len(ready)}, preparing {len(pending)}")
+    report("reused", reused, len(filtered), docs)
+
+    # Score every stale tender that already has eligibility in one batch
+    scored = _score_and_store(company, current_profile_version, ready)
+    docs.extend(scored)
+    recomputed = len(scored)
+    report("scored", len(docs), len(filtered), scored)
+
+    # Prepare the rest concurrently and score each as it arrives
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(MATCH_PREPARE_WORKERS, len(pending)), thread_name_prefix="match-prepare") as pool:
+            futures = {pool.submit(prepare_eligibility, tender): tender for tender in pending}
+            try:
+                for processed, future in enumerate(as_completed(futures), 1):
+                    tender = futures[future]
+                    scored = []
+                    try:
+                        structured_eligibility = future.result()
+                        print(f"  Prepared tender {processed}/{len(pending)}: {tender.get('title', 'Unknown')}")
+                        if structured_eligibility:
+                            scored = _score_and_store(company, current_profile_version, [(tender, structured_eligibility)])
+                            docs.extend(scored)
+                            recomputed += len(scored)
+                    except Exception as tender_error:
+                        print(f"    ⚠️ Error processing tender {tender.get('title')}: {str(tender_error)}")
+                    report("extracting", reused + len(ready) + processed, len(filtered), scored)
+            except MatchCancelled:
+                # Drop preparations that have not started; running ones finish when the pool closes
+                for queued in futures:
+                    queued.cancel()
+                raise
+
+    prune_matches(company_id, tender_ids)
+
+    matches = [doc for doc in docs if doc["matching_score"] >= threshold]
+    matches.sort(key=lambda doc: doc["matching_score"], reverse=True)
+
+    return {
+        "total_filtered": len(filtered),
+        "reused": reused,
+        "recomputed": recomputed,
+        "matches": matches
+    }
@@ -0,0 +1,138 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from core.database import db
+
+matches_collection = db.get_collection("matches")
+
+# Profile fields that change without affecting matching
+PROFILE_VOLATILE_FIELDS = {"_id", "created_at", "updated_at", "submitted"}
+
+# Tender fields copied onto each stored match so rankings can be served without joining
+TENDER_SUMMARY_FIELDS = [
+    "title", "reference_number", "location", "business_category",
+    "deadline", "form_url", "emd", "estimated_budget"
+]
+
+try:
+    matches_collection.create_index([("company_id", ASCENDING), ("tender_id", ASCENDING)], unique=True)
+    matches_collection.create_index([("company_id", ASCENDING), ("matching_score", DESCENDING)])
+except PyMongoError as e:
+    print(f"Error creating match indexes: {str(e)}")
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def profile_version(company: dict) -> str:
+    """Content version of the parts of a company profile that affect matching"""
+    return _digest({k: v for k, v in company.items() if k not in PROFILE_VOLATILE_FIELDS})
+
+
+def eligibility_version(structured_eligibility: Optional[dict]) -> str:
+    """Content version of a tender's structured eligibility"""
+    return _digest(structured_eligibility or {})
+
+
+def tender_version(tender: dict) -> str:
+    """Version of a tender document; every write through the app bumps last_updated"""
+    return _digest(tender.get("last_updated") or tender.get("created_at"))
+
+
+def is_fresh(stored: Optional[dict], company_profile_version: str, tender: dict) -> bool:
+    """
+    True if a stored match was computed from the current profile, tender and eligibility.
+    """
+    if not stored:
+        return False
+    return (
+        stored.get("profile_version") == company_profile_version
+        and stored.get("tender_version") == tender_version(tender)
+        and stored.get("eligibility_version") == eligibility_version(tender.get("structured_eligibility"))
+    )
+
+
+def get_stored_matches(company_id: str, tender_ids: List[str]) -> Dict[str, dict]:
+    """Stored matches of a company for the given tenders, keyed by tender id"""
+    stored = {}
+    for start in range(0, len(tender_ids), 1000):
+        chunk = tender_ids[start:start + 1000]
+        for doc in matches_collection.find({"company_id": company_id, "tender_id": {"$in": chunk}}):
+            stored[doc["tender_id"]] = doc
+    return stored
+
+
+def save_matches(company: dict, company_profile_version: str, scored: List[tuple]) -> List[dict]:
+    """
+    Upsert (tender, structured_eligibility, result) triples for a company and return the stored documents.
+    """
+    company_id = str(company["_id"])
+    now = datetime.utcnow()
+    docs, operations = [], []
+
+    for tender, structured_eligibility, result in scored:
+        doc = {
+            "company_id": company_id,
+            "user_id": company.get("user_id"),
+            "tender_id": str(tender["_id"]),
+            "profile_version": company_profile_version,
+            "tender_version": tender_version(tender),
+            "eligibility_version": eligibility_version(structured_eligibility),
+            "matching_score": result["matching_score"],
+            "eligible": result["eligible"],
+            "field_scores": result["field_scores"],
+            "missing_fields": result["missing_fields"],
+            "tender": {field: tender.get(field) for field in TENDER_SUMMARY_FIELDS},
+            "computed_at": now
+        }
+        docs.append(doc)
+        operations.append(UpdateOne(
+            {"company_id": company_id, "tender_id": doc["tender_id"]},
+            {"$set": doc},
+            upsert=True
+        ))
+
+    if operations:
+        matches_collection.bulk_write(operations, ordered=False)
+    return docs
+
+
+def prune_matches(company_id: str, keep_tender_ids: List[str]) -> int:
+    """Remove stored matches for tenders that no longer pass the company's filter"""
+    result = matches_collection.delete_many({"company_id": company_id, "tender_id": {"$nin": keep_tender_ids}})
+    return result.deleted_count
+
+
+def get_ranked_matches(company_id: str, threshold: float = 60.0, limit: int = 100, skip: int = 0) -> List[dict]:
+    """Precomputed matches of a company at or above threshold, best first"""
+    cursor = matches_collection.find(
+        {"company_id": company_id, "matching_score": {"$gte": threshold}},
+        {"_id": 0}
+    ).sort("matching_score", DESCENDING).skip(skip).limit(limit)
+    return list(cursor)
+
+
+def match_summary(doc: dict, id_key: str = "_id") -> Dict[str, Any]:
+    """Flatten a stored match into the response shape used by the matching endpoints"""
+    tender = doc.get("tender", {})
+    return {
+        id_key: doc["tender_id"],
+        "title": tender.get("title"),
+        "reference_number": tender.get("reference_number"),
+        "location": tender.get("location"),
+        "business_category": tender.get("business_category", []),
+        "deadline": tender.get("deadline"),
+        "form_url": tender.get("form_url"),
+        "matching_score": doc["matching_score"],
+        "field_scores": doc["field_scores"],
+        "eligible": doc["eligible"],
+        "missing_fields": doc["missing_fields"],
+        "emd": tender.get("emd"),
+        "estimated_budget": tender.get("estimated_budget")
+    }
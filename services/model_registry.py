@@ -0,0 +1,54 @@
+import threading
+import time
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Loaded models and their load statistics, shared by every service in the process
+_models = {}
+_model_stats = {}
+_lock = threading.Lock()
+
+
+def get_model(model_name: str = DEFAULT_MODEL_NAME):
+    """
+    Return the shared SentenceTransformer for model_name, loading it on first use.
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            started = time.perf_counter()
+            model = SentenceTransformer(model_name)
+            load_seconds = time.perf_counter() - started
+
+            memory_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+            memory_bytes += sum(b.numel() * b.element_size() for b in model.buffers())
+
+            _models[model_name] = model
+            _model_stats[model_name] = {
+                "model_name": model_name,
+                "load_seconds": round(load_seconds, 3),
+                "memory_bytes": memory_bytes,
+                "memory_mb": round(memory_bytes / (1024 * 1024), 2),
+                "embedding_dimension": model.get_sentence_embedding_dimension(),
+                "loaded_at": time.time()
+            }
+            print(f"🧠 Loaded model {model_name} in {load_seconds:.2f}s ({_model_stats[model_name]['memory_mb']} MB)")
+
+    return model
+
+
+def get_model_stats() -> dict:
+    """
+    Report memory footprint and load time of every model loaded in this process.
+    """
+    return {
+        "loaded_models": len(_model_stats),
+        "total_memory_mb": round(sum(s["memory_bytes"] for s in _model_stats.values()) / (1024 * 1024), 2),
+        "models": [dict(stats) for stats in _model_stats.values()]
+    }
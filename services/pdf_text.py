@@ -0,0 +1,152 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pdfplumber
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from core.database import db
+from services.document_fetcher import content_hash
+
+# Per-page text by document content hash, shared by the summarizer and anything else reading PDFs
+pdf_pages = db.get_collection("pdf_pages")
+
+# Worker processes for page extraction; 0 or 1 extracts in the calling thread
+PDF_TEXT_WORKERS = int(os.getenv("PDF_TEXT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Pages handed to a worker per task (each task reopens the document from a temporary file)
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+try:
+    pdf_pages.create_index([("content_hash", ASCENDING), ("page", ASCENDING)], unique=True)
+except PyMongoError as e:
+    print(f"Error creating PDF page indexes: {str(e)}")
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if PDF_TEXT_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process is multi-threaded, so forking it is unsafe
+            _pool = ProcessPoolExecutor(max_workers=PDF_TEXT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _extract_pages(pdf_path: str, page_numbers: List[int]) -> List[str]:
+    """Text of the given 0-based pages of the PDF at pdf_path (runs in worker processes)"""
+    with pdfplumber.open(pdf_path) as document:
+        return [document.pages[number].extract_text() or "" for number in page_numbers]
+
+
+def _spill(pdf_bytes: bytes) -> str:
+    """Write the document to a temporary file once, so worker tasks get a path instead of pickled bytes"""
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as fh:
+        fh.write(pdf_bytes)
+        return fh.name
+
+
+def _cached_pages(document_hash: str, page_numbers: List[int]) -> Dict[int, str]:
+    try:
+        cursor = pdf_pages.find(
+            {"content_hash": document_hash, "page": {"$in": page_numbers}},
+            {"_id": 0, "page": 1, "text": 1}
+        )
+        return {doc["page"]: doc["text"] for doc in cursor}
+    except PyMongoError as e:
+        print(f"⚠️ PDF page cache unavailable: {str(e)}")
+        return {}
+
+
+def _store_pages(document_hash: str, texts: Dict[int, str]):
+    if not texts:
+        return
+    try:
+        pdf_pages.bulk_write([
+            UpdateOne(
+                {"content_hash": document_hash, "page": number},
+                {"$set": {"text": text}},
+                upsert=True
+            )
+            for number, text in texts.items()
+        ], ordered=False)
+    except PyMongoError as e:
+        print(f"⚠️ Could not store PDF page text: {str(e)}")
+
+
+def _extract_window(pool: ProcessPoolExecutor, pdf_path: str, page_numbers: List[int]) -> Dict[int, str]:
+    """Extract a window of pages spread over the process pool, PDF_PAGES_PER_TASK pages per task"""
+    chunks = [page_numbers[i:i + PDF_PAGES_PER_TASK] for i in range(0, len(page_numbers), PDF_PAGES_PER_TASK)]
+    futures = [pool.submit(_extract_pages, pdf_path, chunk) for chunk in chunks]
+    texts = {}
+    for chunk, future in zip(chunks, futures):
+        texts.update(zip(chunk, future.result()))
+    return texts
+
+
+def iter_page_texts(pdf_bytes: bytes, document_hash: Optional[str] = None, parallel: bool = True) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) in page order, lazily.
+
+    Pages are read a window at a time, from the page cache when present and by
+    extraction otherwise; newly extracted pages are cached under the document
+    hash. With parallel and a process pool, missing pages of a window (one task
+    per worker) are extracted by the pool from a temporary copy of the file.
+    Otherwise pages are extracted inline one at a time, so stopping the
+    iteration stops extraction at the current page.
+    """
+    document_hash = document_hash or content_hash(pdf_bytes)
+    pool = _get_pool() if parallel else None
+    window = max(PDF_TEXT_WORKERS, 1) * PDF_PAGES_PER_TASK if pool else PDF_PAGES_PER_TASK
+    pdf_path = None
+
+    try:
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as document:
+            page_count = len(document.pages)
+            for start in range(0, page_count, window):
+                page_numbers = list(range(start, min(start + window, page_count)))
+                texts = _cached_pages(document_hash, page_numbers)
+                missing = [number for number in page_numbers if number not in texts]
+
+                if pool is not None and len(missing) > PDF_PAGES_PER_TASK:
+                    pdf_path = pdf_path or _spill(pdf_bytes)
+                    extracted = _extract_window(pool, pdf_path, missing)
+                    _store_pages(document_hash, extracted)
+                    texts.update(extracted)
+
+                extracted = {}
+                try:
+                    for number in page_numbers:
+                        if number not in texts:
+                            texts[number] = extracted[number] = document.pages[number].extract_text() or ""
+                        yield number, texts[number]
+                finally:
+                    _store_pages(document_hash, extracted)
+    finally:
+        if pdf_path:
+            os.unlink(pdf_path)
+
+
+def extract_text(pdf_bytes: bytes, max_chars: Optional[int] = None, document_hash: Optional[str] = None) -> str:
+    """
+    Text of a PDF, reading pages only until max_chars characters are collected.
+    A budgeted read extracts inline, so no page past the budget is parsed.
+    """
+    parts, collected = [], 0
+    for _, page_text in iter_page_texts(pdf_bytes, document_hash, parallel=max_chars is None):
+        if not page_text:
+            continue
+        parts.append(page_text + "\n")
+        collected += len(page_text) + 1
+        if max_chars is not None and collected >= max_chars:
+            break
+    text = "".join(parts)
+    return text[:max_chars] if max_chars is not None else text
@@ -1,32 +1,93 @@
-import pdfplumber
+import threading
 import google.generativeai as genai
+from services.pdf_text import extract_text
+
+SUMMARY_MODEL_NAME = "gemini-1.5-flash"
+# Characters of PDF text sent to Gemini; pages past this budget are never extracted
+SUMMARY_MAX_CHARS = 15000
+# Finish reasons of a summary that ran to its natural end
+COMPLETE_FINISH_REASONS = {"STOP", "FINISH_REASON_UNSPECIFIED"}
+
+class SummaryIncomplete(Exception):
+    """Raised at the end of a streamed summary that lost chunks or was cut off"""
 
 class PDFSummaryService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, model_name=SUMMARY_MODEL_NAME):
         self.api_key = api_key
+        self.model_name = model_name
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
+        self.model = genai.GenerativeModel(model_name)
 
-    def extract_text_from_pdf(self, pdf_path):
-        text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text
+    def extract_text_from_pdf(self, pdf, max_chars=SUMMARY_MAX_CHARS, document_hash=None):
+        """Extract text from a PDF given as a path or as raw bytes, stopping once max_chars are collected"""
+        if not isinstance(pdf, (bytes, bytearray)):
+            with open(pdf, "rb") as fh:
+                pdf = fh.read()
+        return extract_text(bytes(pdf), max_chars=max_chars, document_hash=document_hash)
+
+    def build_prompt(self, text):
+        if len(text) > SUMMARY_MAX_CHARS:
+            text = text[:SUMMARY_MAX_CHARS]
+        return f"Summarize the following PDF content in concise bullet points:\n\n{text}"
 
     def summarize_text(self, text):
         if not text.strip():
             return "No text found in the PDF."
 
-        if len(text) > 15000:
-            text = text[:15000]
-
-        prompt = f"Summarize the following PDF content in concise bullet points:\n\n{text}"
-        response = self.model.generate_content(prompt)
+        response = self.model.generate_content(self.build_prompt(text))
         return response.text
 
-    def summarize_pdf(self, pdf_path):
-        text = self.extract_text_from_pdf(pdf_path)
+    def stream_summary_text(self, text):
+        """
+        Yield the summary in chunks as Gemini generates them.
+
+        Raises SummaryIncomplete after the last chunk if any chunk had no text
+        (e.g. a safety block), generation stopped for any reason other than
+        STOP (safety, max tokens, ...) or nothing was generated at all.
+        """
+        if not text.strip():
+            yield "No text found in the PDF."
+            return
+
+        response = self.model.generate_content(self.build_prompt(text), stream=True)
+        skipped, produced, finish_reason = 0, False, None
+        for chunk in response:
+            for candidate in getattr(chunk, "candidates", None) or []:
+                reason = getattr(candidate.finish_reason, "name", str(candidate.finish_reason))
+                if reason != "FINISH_REASON_UNSPECIFIED":
+                    finish_reason = reason
+            try:
+                chunk_text = chunk.text
+            except ValueError:  # chunk without text parts (e.g. a safety block)
+                skipped += 1
+                continue
+            if chunk_text:
+                produced = True
+                yield chunk_text
+
+        if skipped:
+            raise SummaryIncomplete(f"{skipped} chunk(s) were blocked (finish reason {finish_reason or 'unknown'})")
+        if finish_reason and finish_reason not in COMPLETE_FINISH_REASONS:
+            raise SummaryIncomplete(f"generation stopped early ({finish_reason})")
+        if not produced:
+            raise SummaryIncomplete("Gemini returned no summary text")
+
+    def summarize_pdf(self, pdf, document_hash=None):
+        text = self.extract_text_from_pdf(pdf, document_hash=document_hash)
         return self.summarize_text(text)
+
+    def stream_summary_pdf(self, pdf, document_hash=None):
+        text = self.extract_text_from_pdf(pdf, document_hash=document_hash)
+        yield from self.stream_summary_text(text)
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+def get_summary_service(api_key, model_name=SUMMARY_MODEL_NAME):
+    """Shared PDFSummaryService per (api_key, model), so Gemini is configured once per process"""
+    with _services_lock:
+        service = _services.get((api_key, model_name))
+        if service is None:
+            service = _services[(api_key, model_name)] = PDFSummaryService(api_key, model_name)
+        return service
@@ -0,0 +1,58 @@
+import os
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from core.database import db
+
+# Ranked filter results kept between pages of /tenders/summary, so later pages neither
+# re-run the filter nor shift when the ranking changes underneath them
+summary_snapshots = db.get_collection("tender_summary_snapshots")
+
+SUMMARY_SNAPSHOT_TTL_SECONDS = int(os.getenv("SUMMARY_SNAPSHOT_TTL_SECONDS", "900"))
+
+try:
+    summary_snapshots.create_index("created_at", expireAfterSeconds=SUMMARY_SNAPSHOT_TTL_SECONDS)
+except PyMongoError as e:
+    print(f"Error creating summary snapshot indexes: {str(e)}")
+
+
+class InvalidCursor(Exception):
+    """Raised for a cursor that is malformed, expired or belongs to another user"""
+
+
+def create_snapshot(user_id: str, tender_ids: List[str]) -> str:
+    """Store a ranked id list and return its token"""
+    token = uuid.uuid4().hex
+    summary_snapshots.insert_one({
+        "_id": token,
+        "user_id": user_id,
+        "tender_ids": tender_ids,
+        "count": len(tender_ids),
+        "created_at": datetime.utcnow()
+    })
+    return token
+
+
+def encode_cursor(token: str, offset: int) -> str:
+    return f"{token}.{offset}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    token, _, offset = cursor.partition(".")
+    if not token or not offset.isdigit():
+        raise InvalidCursor("Malformed cursor")
+    return token, int(offset)
+
+
+def get_snapshot_page(token: str, user_id: str, offset: int, limit: int) -> Tuple[List[str], int]:
+    """Ids at [offset, offset + limit) of a snapshot and its total size; only that slice is read"""
+    snapshot: Optional[dict] = summary_snapshots.find_one(
+        {"_id": token, "user_id": user_id},
+        {"tender_ids": {"$slice": [offset, limit]}, "count": 1}
+    )
+    if not snapshot:
+        raise InvalidCursor("Cursor has expired")
+    return snapshot["tender_ids"], snapshot["count"]
@@ -0,0 +1,393 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Row kinds stored in the index
+KINDS = ("category", "scope")
+
+# Below this many live vectors the index searches exhaustively
+MIN_TRAIN_SIZE = int(os.getenv("TENDER_INDEX_MIN_TRAIN_SIZE", "1024"))
+# Retrain the coarse quantizer once the index has grown this many times past its training size
+RETRAIN_GROWTH = 4
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 20000
+# Rewrite the index file at most this often, unless forced
+PERSIST_INTERVAL_SECONDS = 30
+
+
+class TenderIndex:
+    """
+    IVF (inverted file) approximate nearest-neighbour index over normalized tender embeddings.
+
+    Vectors are assigned to the nearest of sqrt(N) k-means centroids; a query only scores
+    the vectors in its nprobe closest lists. Rows are tagged with the tender id and the kind
+    of embedding (category or scope) so a search can be restricted to one kind.
+    """
+
+    def __init__(self, dimension: Optional[int] = None, nprobe: int = 16):
+        self.dimension = dimension
+        self.nprobe = nprobe
+        self.size = 0
+        self.vectors = np.zeros((0, dimension or 0), dtype=np.float32)
+        self.kinds = np.zeros(0, dtype=np.int8)
+        self.alive = np.zeros(0, dtype=bool)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.deadlines = np.zeros(0, dtype=np.float64)
+        self.tender_ids: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self.watermark: Optional[datetime] = None
+        self.deletion_watermark: Optional[datetime] = None
+        self.dirty = False
+        self._live = 0
+
+        self._rows_by_tender: Dict[str, List[int]] = {}
+        self._lists: Dict[int, List[int]] = {}
+        self._list_arrays: Dict[int, np.ndarray] = {}
+        self._last_persist = 0.0
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------ #
+    # Mutation
+    # ------------------------------------------------------------------ #
+    def upsert(
+        self,
+        tender_id: str,
+        vectors_by_kind: Dict[str, Sequence[Sequence[float]]],
+        deadline: Optional[datetime] = None
+    ):
+        """Replace every row of tender_id with the given vectors; deadline (naive UTC) enables expiry masking"""
+        deadline_ts = _timestamp(deadline)
+        with self._lock:
+            self._remove_rows(tender_id)
+
+            new_rows = []
+            for kind, vectors in vectors_by_kind.items():
+                if vectors is None or len(vectors) == 0:
+                    continue
+                matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+                self._ensure_dimension(matrix.shape[1])
+                start = self._append(matrix, KINDS.index(kind), tender_id, deadline_ts)
+                new_rows.extend(range(start, start + len(matrix)))
+
+            if new_rows:
+                self._rows_by_tender[tender_id] = new_rows
+                if self.centroids is not None:
+                    self._assign(np.asarray(new_rows))
+
+            self.dirty = True
+            self._maybe_compact()
+            self._maybe_train()
+
+    def remove(self, tender_id: str):
+        """Drop every row of tender_id"""
+        with self._lock:
+            if self._remove_rows(tender_id):
+                self.dirty = True
+                self._maybe_compact()
+
+    def tender_count(self) -> int:
+        return len(self._rows_by_tender)
+
+    def live_count(self) -> int:
+        return self._live
+
+    def indexed_tender_ids(self) -> List[str]:
+        return list(self._rows_by_tender)
+
+    def _remove_rows(self, tender_id: str) -> bool:
+        rows = self._rows_by_tender.pop(tender_id, None)
+        if not rows:
+            return False
+        self.alive[rows] = False
+        self._live -= len(rows)
+        return True
+
+    def _ensure_dimension(self, dimension: int):
+        if self.dimension is None or self.size == 0 and self.vectors.shape[1] != dimension:
+            self.dimension = dimension
+            self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        elif dimension != self.dimension:
+            raise ValueError(f"Embedding dimension {dimension} does not match index dimension {self.dimension}")
+
+    def _append(self, matrix: np.ndarray, kind_code: int, tender_id: str, deadline_ts: float) -> int:
+        needed = self.size + len(matrix)
+        if needed > len(self.vectors):
+            capacity = max(needed, 2 * len(self.vectors), 256)
+            self.vectors = _grow(self.vectors, capacity)
+            self.kinds = _grow(self.kinds, capacity)
+            self.alive = _grow(self.alive, capacity)
+            self.assignments = _grow(self.assignments, capacity)
+            self.deadlines = _grow(self.deadlines, capacity)
+
+        start = self.size
+        self.vectors[start:needed] = matrix
+        self.kinds[start:needed] = kind_code
+        self.alive[start:needed] = True
+        self.assignments[start:needed] = -1
+        self.deadlines[start:needed] = deadline_ts
+        self.tender_ids.extend([tender_id] * len(matrix))
+        self.size = needed
+        self._live += len(matrix)
+        return start
+
+    def _maybe_compact(self):
+        """Compact once removed (or replaced) rows make up more than half the storage"""
+        if self._live < self.size // 2:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite storage without removed rows"""
+        keep = np.flatnonzero(self.alive[:self.size])
+        self.vectors = self.vectors[keep].copy()
+        self.kinds = self.kinds[keep].copy()
+        self.assignments = self.assignments[keep].copy()
+        self.deadlines = self.deadlines[keep].copy()
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.tender_ids = [self.tender_ids[i] for i in keep]
+        self.size = len(keep)
+        self._rebuild_lookup()
+
+    def _rebuild_lookup(self):
+        self._live = int(self.alive[:self.size].sum())
+        self._rows_by_tender = {}
+        for row in np.flatnonzero(self.alive[:self.size]):
+            self._rows_by_tender.setdefault(self.tender_ids[row], []).append(int(row))
+        self._lists = {}
+        for row in np.flatnonzero(self.alive[:self.size] & (self.assignments[:self.size] >= 0)):
+            self._lists.setdefault(int(self.assignments[row]), []).append(int(row))
+        self._list_arrays = {}
+
+    # ------------------------------------------------------------------ #
+    # Coarse quantizer
+    # ------------------------------------------------------------------ #
+    def _maybe_train(self):
+        live = self.live_count()
+        if live < MIN_TRAIN_SIZE:
+            return
+        if self.centroids is None or live > self.trained_size * RETRAIN_GROWTH:
+            self.train()
+
+    def train(self):
+        """Run spherical k-means over live vectors and reassign every row"""
+        with self._lock:
+            live_rows = np.flatnonzero(self.alive[:self.size])
+            if len(live_rows) == 0:
+                return
+            started = time.perf_counter()
+            nlist = max(1, min(1024, int(np.sqrt(len(live_rows)))))
+
+            rng = np.random.default_rng(0)
+            sample_rows = live_rows
+            if len(sample_rows) > KMEANS_SAMPLE_SIZE:
+                sample_rows = rng.choice(live_rows, KMEANS_SAMPLE_SIZE, replace=False)
+            sample = self.vectors[sample_rows]
+
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+            for _ in range(KMEANS_ITERATIONS):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                counts = np.bincount(labels, minlength=nlist)
+                filled = counts > 0
+                centroids[filled] = sums[filled]
+                centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+
+            self.centroids = centroids.astype(np.float32)
+            self.trained_size = len(live_rows)
+            self.assignments[:self.size] = -1
+            self._assign(live_rows)
+            self._rebuild_lookup()
+            self.dirty = True
+            print(f"🗂️ Trained tender index: {len(live_rows)} vectors, {nlist} lists in {time.perf_counter() - started:.2f}s")
+
+    def _assign(self, rows: np.ndarray):
+        labels = np.argmax(self.vectors[rows] @ self.centroids.T, axis=1)
+        self.assignments[rows] = labels
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            self._lists.setdefault(label, []).append(row)
+            self._list_arrays.pop(label, None)
+
+    def _list_rows(self, label: int) -> np.ndarray:
+        rows = self._list_arrays.get(label)
+        if rows is None:
+            rows = np.asarray(self._lists.get(label, []), dtype=np.int64)
+            self._list_arrays[label] = rows
+        return rows
+
+    # ------------------------------------------------------------------ #
+    # Search
+    # ------------------------------------------------------------------ #
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 100,
+        kinds: Sequence[str] = KINDS,
+        threshold: Optional[float] = None,
+        nprobe: Optional[int] = None,
+        open_after: Optional[datetime] = None
+    ) -> List[List[Tuple[str, str, float]]]:
+        """
+        Return, for each normalized query vector, up to k (tender_id, kind, score) hits sorted by score.
+        With open_after, rows of tenders whose deadline is earlier are skipped.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+
+        with self._lock:
+            if self.size == 0:
+                return [[] for _ in range(len(queries))]
+
+            kind_codes = np.asarray([KINDS.index(kind) for kind in kinds], dtype=np.int8)
+            open_after_ts = _timestamp(open_after)
+            nprobe = nprobe or self.nprobe
+            all_rows = None
+            probe_labels = None
+            if self.centroids is None:
+                all_rows = np.flatnonzero(self.alive[:self.size])
+            else:
+                centroid_scores = queries @ self.centroids.T
+                probe = min(nprobe, len(self.centroids))
+                probe_labels = np.argpartition(-centroid_scores, probe - 1, axis=1)[:, :probe]
+
+            results = []
+            for position, query in enumerate(queries):
+                if all_rows is not None:
+                    rows = all_rows
+                else:
+                    rows = np.concatenate([self._list_rows(label) for label in probe_labels[position]])
+                    rows = rows[self.alive[rows]]
+
+                rows = rows[np.isin(self.kinds[rows], kind_codes)]
+                if not np.isnan(open_after_ts):
+                    deadlines = self.deadlines[rows]
+                    rows = rows[np.isnan(deadlines) | (deadlines >= open_after_ts)]
+                if len(rows) == 0:
+                    results.append([])
+                    continue
+
+                scores = self.vectors[rows] @ query
+                if threshold is not None:
+                    keep = scores >= threshold
+                    rows, scores = rows[keep], scores[keep]
+                if len(rows) > k:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    rows, scores = rows[top], scores[top]
+                order = np.argsort(-scores)
+
+                results.append([
+                    (self.tender_ids[rows[i]], KINDS[self.kinds[rows[i]]], float(scores[i]))
+                    for i in order
+                ])
+            return results
+
+    # ------------------------------------------------------------------ #
+    # Persistence
+    # ------------------------------------------------------------------ #
+    def save(self, path: str):
+        """
+        Atomically write the index to path (.npz), unless the file there was
+        written from a later sync (another worker's), which is left in place.
+        """
+        with self._lock:
+            saved_watermark, saved_deletion_watermark = _saved_watermarks(path)
+            if _is_later(saved_watermark, self.watermark) or _is_later(saved_deletion_watermark, self.deletion_watermark):
+                print(f"🗂️ Tender index at {path} is newer than this worker's; not overwriting it")
+                return
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as fh:
+                np.savez(
+                    fh,
+                    vectors=self.vectors[:self.size],
+                    kinds=self.kinds[:self.size],
+                    alive=self.alive[:self.size],
+                    assignments=self.assignments[:self.size],
+                    deadlines=self.deadlines[:self.size],
+                    tender_ids=np.asarray(self.tender_ids, dtype="U32"),
+                    centroids=self.centroids if self.centroids is not None else np.zeros((0, self.dimension or 0), dtype=np.float32),
+                    trained_size=np.asarray(self.trained_size),
+                    watermark=np.asarray(_isoformat(self.watermark)),
+                    deletion_watermark=np.asarray(_isoformat(self.deletion_watermark))
+                )
+            os.replace(tmp_path, path)
+            self.dirty = False
+            self._last_persist = time.monotonic()
+
+    def persist(self, path: str, force: bool = False):
+        """Save if there are unsaved changes and the last save is old enough (or force is set)"""
+        if not self.dirty:
+            return
+        if force or time.monotonic() - self._last_persist >= PERSIST_INTERVAL_SECONDS:
+            try:
+                self.save(path)
+            except OSError as e:
+                print(f"⚠️ Could not persist tender index to {path}: {e}")
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = 16) -> "TenderIndex":
+        with np.load(path, allow_pickle=False) as data:
+            vectors = data["vectors"].astype(np.float32)
+            index = cls(dimension=vectors.shape[1] if vectors.size else None, nprobe=nprobe)
+            index.vectors = vectors
+            index.kinds = data["kinds"].astype(np.int8)
+            index.alive = data["alive"].astype(bool)
+            index.assignments = data["assignments"].astype(np.int32)
+            if "deadlines" in data.files:
+                index.deadlines = data["deadlines"].astype(np.float64)
+            else:
+                index.deadlines = np.full(len(index.assignments), np.nan)
+            index.tender_ids = [str(t) for t in data["tender_ids"]]
+            centroids = data["centroids"]
+            index.centroids = centroids.astype(np.float32) if len(centroids) else None
+            index.trained_size = int(data["trained_size"])
+            index.watermark = _parse_isoformat(str(data["watermark"]))
+            if "deletion_watermark" in data.files:
+                index.deletion_watermark = _parse_isoformat(str(data["deletion_watermark"]))
+
+        index.size = len(index.tender_ids)
+        index._rebuild_lookup()
+        index._last_persist = time.monotonic()
+        return index
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    """POSIX timestamp of a naive UTC datetime, NaN when unknown"""
+    if not isinstance(value, datetime):
+        return float("nan")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _isoformat(value: Optional[datetime]) -> str:
+    return value.isoformat() if value else ""
+
+
+def _parse_isoformat(value: str) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _is_later(value: Optional[datetime], other: Optional[datetime]) -> bool:
+    return value is not None and (other is None or value > other)
+
+
+def _saved_watermarks(path: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Watermarks of the index file at path, (None, None) if there is none or it cannot be read"""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            deletion_watermark = str(data["deletion_watermark"]) if "deletion_watermark" in data.files else ""
+            return _parse_isoformat(str(data["watermark"])), _parse_isoformat(deletion_watermark)
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+
+def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
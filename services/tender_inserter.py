@@ -5,13 +5,31 @@ from typing import List, Dict, Any, Optional
 from pymongo import MongoClient
 from pymongo.errors import DuplicateKeyError, PyMongoError
 from core.database import db
+from core.utils import parse_deadline
 from services.blob_uploader import BlobUploader
+from services.basic_filter import (
+    encode_categories,
+    encode_scope,
+    index_tender,
+    unindex_tender,
+    persist_tender_index,
+    INDEX_PROJECTION
+)
 import os
 
 class TenderInserter:
     def __init__(self):
         self.tenders_collection = db.get_collection("filtered_tenders")
         self.blob_uploader = BlobUploader() if self._azure_configured() else None
+        self._ensure_indexes()
+        
+    def _ensure_indexes(self):
+        """Create the indexes used by expiry filtering and index syncing"""
+        try:
+            self.tenders_collection.create_index("deadline_at")
+            self.tenders_collection.create_index("last_updated")
+        except PyMongoError as e:
+            print(f"Error creating tender indexes: {str(e)}")
         
     def _azure_configured(self) -> bool:
         """Check if Azure Blob Storage is configured"""
@@ -39,6 +57,10 @@ class TenderInserter:
             # Normalize and clean data
             normalized_data = self._normalize_tender_data(tender_data)
             
+            # Precompute embeddings used by the semantic filter and tender index
+            normalized_data["category_embeddings"] = encode_categories(normalized_data["business_category"])
+            normalized_data["scope_embedding"] = encode_scope(normalized_data["scope_of_work"])
+            
             # Add metadata
             normalized_data.update({
                 "created_at": datetime.utcnow(),
@@ -49,6 +71,7 @@ class TenderInserter:
             
             # Insert into database
             result = self.tenders_collection.insert_one(normalized_data)
+            self._refresh_index(normalized_data)
             
             return {
                 "success": True,
@@ -103,6 +126,8 @@ class TenderInserter:
                     "error": result["error"]
                 })
         
+        persist_tender_index()
+        
         return results
 
     def update_tender(self, tender_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -119,6 +144,17 @@ class TenderInserter:
         try:
             from bson import ObjectId
             
+            # Keep category embeddings in sync with the categories
+            if "business_category" in update_data:
+                update_data["business_category"] = self._normalize_tender_data(
+                    {"business_category": update_data["business_category"]}
+                )["business_category"]
+                update_data["category_embeddings"] = encode_categories(update_data["business_category"])
+            if "scope_of_work" in update_data:
+                update_data["scope_embedding"] = encode_scope(update_data["scope_of_work"])
+            if "deadline" in update_data:
+                update_data["deadline_at"] = parse_deadline(update_data["deadline"])
+            
             # Add update timestamp
             update_data["last_updated"] = datetime.utcnow()
             
@@ -134,6 +170,11 @@ class TenderInserter:
                     "tender_id": tender_id
                 }
             
+            if {"category_embeddings", "scope_embedding", "deadline_at"} & update_data.keys():
+                tender = self.tenders_collection.find_one({"_id": ObjectId(tender_id)}, INDEX_PROJECTION)
+                if tender:
+                    self._refresh_index(tender)
+            
             return {
                 "success": True,
                 "tender_id": tender_id,
@@ -171,6 +212,11 @@ class TenderInserter:
                     "tender_id": tender_id
                 }
             
+            try:
+                unindex_tender(tender_id)
+            except Exception as e:
+                print(f"Error removing tender {tender_id} from index: {str(e)}")
+            
             return {
                 "success": True,
                 "tender_id": tender_id,
@@ -185,6 +231,18 @@ class TenderInserter:
                 "tender_id": tender_id
             }
 
+    def _refresh_index(self, tender: Dict[str, Any]):
+        """
+        Push a tender's embeddings into the ANN index; index errors never fail the write
+        
+        Args:
+            tender: Tender document with _id and embedding fields
+        """
+        try:
+            index_tender(tender)
+        except Exception as e:
+            print(f"Error indexing tender {tender.get('_id')}: {str(e)}")
+
     def _validate_tender_data(self, tender_data: Dict[str, Any]) -> bool:
         """
         Validate that tender data contains required fields
@@ -287,8 +345,39 @@ class TenderInserter:
             elif field not in normalized:
                 normalized[field] = ""
         
+        # Parsed deadline used for indexed expiry filtering; the display string is kept as-is
+        normalized["deadline_at"] = parse_deadline(normalized["deadline"])
+        
         return normalized
 
+    def normalize_deadlines(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Parse deadline_at for tenders stored before deadlines were normalized
+        
+        Args:
+            force: Re-parse every tender, not only those missing deadline_at
+            
+        Returns:
+            Dict with backfill counts
+        """
+        query = {} if force else {"deadline_at": {"$exists": False}}
+        results = {"processed": 0, "parsed": 0, "unparsed": 0}
+        
+        try:
+            for tender in self.tenders_collection.find(query, {"deadline": 1}):
+                deadline_at = parse_deadline(tender.get("deadline"))
+                self.tenders_collection.update_one(
+                    {"_id": tender["_id"]},
+                    {"$set": {"deadline_at": deadline_at, "last_updated": datetime.utcnow()}}
+                )
+                results["processed"] += 1
+                results["parsed" if deadline_at else "unparsed"] += 1
+        except Exception as e:
+            print(f"Error normalizing deadlines: {str(e)}")
+            results["error"] = str(e)
+        
+        return results
+
     def get_tender_stats(self) -> Dict[str, Any]:
         """
         Get statistics about tenders in the database
@@ -348,7 +437,7 @@ class TenderInserter:
                 ]
             }
             
-            results = list(self.tenders_collection.find(search_filter).limit(limit))
+            results = list(self.tenders_collection.find(search_filter, {"category_embeddings": 0, "scope_embedding": 0}).limit(limit))
             
             # Convert ObjectId to string for JSON serialization
             for result in results:
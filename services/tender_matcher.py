@@ -1,102 +1,254 @@
-from sentence_transformers import SentenceTransformer, util
+import re
+import threading
+import numpy as np
+from rapidfuzz import fuzz, process
+from sentence_transformers import util
+from services.embedding_cache import embed_texts
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Lexical fast path: token-set ratio (0-100) at or above which two items match without embeddings
+LEXICAL_MATCH_THRESHOLD = 90
+# Guard against subset matches of short generic words ("Certificate" vs "GST Certificate")
+LEXICAL_MIN_LENGTH_RATIO = 0.8
+
+# How many requirement comparisons each cascade stage decided, process-wide
+_stage_counts = {"exact": 0, "fuzzy": 0, "embedding": 0}
+_stage_lock = threading.Lock()
+
+def _normalize_item(text: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(text).lower()).split())
+
+def _identifier_tokens(text: str) -> set:
+    """Tokens that name a specific thing: numbers and codes ("9001", "gstr3b") and single letters ("a")"""
+    return {token for token in text.split() if len(token) == 1 or any(ch.isdigit() for ch in token)}
+
+def _lexical_match(required: str, provided_norm: list) -> bool:
+    """
+    Near-identical match: high token-set ratio, similar length and the same
+    identifier tokens, so "iso 9001" never settles "iso 14001" and "class a"
+    never settles "class b". Anything else falls through to the embedding tier.
+    """
+    identifiers = _identifier_tokens(required)
+    matches = process.extract(required, provided_norm, scorer=fuzz.token_set_ratio, score_cutoff=LEXICAL_MATCH_THRESHOLD, limit=None)
+    for candidate, _, _ in matches:
+        shorter, longer = sorted((len(required), len(candidate)))
+        if longer == 0 or shorter / longer < LEXICAL_MIN_LENGTH_RATIO:
+            continue
+        if _identifier_tokens(candidate) == identifiers:
+            return True
+    return False
+
+def cascade_match(required_items: list, provided_list: list, threshold: float = 0.75) -> dict:
+    """
+    Decide which required items are covered by the provided items.
+
+    Normalized exact matches and near-identical strings (rapidfuzz token-set ratio)
+    are settled lexically; only the remaining ambiguous items are embedded and
+    compared in one similarity matrix. Returns {required_item: matched}.
+    """
+    unique_required = list(dict.fromkeys(required_items))
+    if not unique_required or not provided_list:
+        return {req: False for req in unique_required}
+
+    provided_norm = list(dict.fromkeys(_normalize_item(p) for p in provided_list))
+    provided_set = set(provided_norm)
+
+    found, ambiguous = {}, []
+    counts = {"exact": 0, "fuzzy": 0, "embedding": 0}
+    for req in unique_required:
+        req_norm = _normalize_item(req)
+        if req_norm in provided_set:
+            found[req] = True
+            counts["exact"] += 1
+        elif _lexical_match(req_norm, provided_norm):
+            found[req] = True
+            counts["fuzzy"] += 1
+        else:
+            ambiguous.append(req)
+
+    if ambiguous:
+        hits = (util.cos_sim(embed_texts(ambiguous), embed_texts(provided_list)) >= threshold).any(dim=1).tolist()
+        found.update(zip(ambiguous, hits))
+        counts["embedding"] += len(ambiguous)
+
+    with _stage_lock:
+        for stage, count in counts.items():
+            _stage_counts[stage] += count
+    return found
+
+def get_match_stage_stats() -> dict:
+    """Requirement comparisons settled by each cascade stage since process start"""
+    with _stage_lock:
+        counts = dict(_stage_counts)
+    total = sum(counts.values())
+    return {
+        **counts,
+        "total": total,
+        "lexical_share": round((counts["exact"] + counts["fuzzy"]) / total, 4) if total else 0.0
+    }
 
 def compute_embedding_similarity_list(required_list, provided_list, threshold=0.75):
-    matched, missing = [], []
-    for req in required_list:
-        emb_req = model.encode(req, convert_to_tensor=True)
-        found = False
-        for prov in provided_list:
-            emb_prov = model.encode(prov, convert_to_tensor=True)
-            if util.cos_sim(emb_req, emb_prov).item() >= threshold:
-                matched.append(req)
-                found = True
-                break
-        if not found:
-            missing.append(req)
-    score = len(matched) / len(required_list) if required_list else 1.0
+    """
+    Match each required item against the provided items.
+
+    Clear cases are settled lexically; the rest are compared by embedding
+    similarity in a single matrix. A requirement is matched if any provided
+    item clears threshold.
+    """
+    if not required_list:
+        return 1.0, [], []
+    if not provided_list:
+        return 0.0, [], list(required_list)
+
+    found = cascade_match(required_list, provided_list, threshold)
+
+    matched = [req for req in required_list if found[req]]
+    missing = [req for req in required_list if not found[req]]
+    score = len(matched) / len(required_list)
     return round(score, 2), matched, missing
 
-def compute_tender_match_score(eligibility: dict, company: dict):
-    score, total_weight = 0, 0
-    field_scores, missing_fields = {}, {}
-
-    # PAN check
-    if eligibility.get("pan", {}).get("required"):
-        s = 1 if company.get("pan") else 0
-        field_scores["pan"] = s
-        if s == 0:
-            missing_fields["pan"] = "Missing PAN"
-        score += s * 0.1
-        total_weight += 0.1
-
-    # GSTIN check
-    if eligibility.get("gstin", {}).get("required"):
-        s = 1 if company.get("gstin") else 0
-        field_scores["gstin"] = s
-        if s == 0:
-            missing_fields["gstin"] = "Missing GSTIN"
-        score += s * 0.1
-        total_weight += 0.1
-
-    # Experience check (safe null fallback)
-    required_exp = eligibility.get("experience", {}).get("minimum_years") or 0
+def _section(eligibility: dict, key: str) -> dict:
+    value = eligibility.get(key)
+    return value if isinstance(value, dict) else {}
+
+def _as_list(value) -> list:
+    return [str(v) for v in value if v] if isinstance(value, list) else []
+
+def _company_experience(company: dict) -> int:
     try:
-        company_exp = int(company.get("prior_experience", "0").split()[0])
+        return int(company.get("prior_experience", "0").split()[0])
     except Exception:
-        company_exp = 0
-    s = 1 if company_exp >= required_exp else round(company_exp / required_exp, 2) if required_exp > 0 else 1
-    field_scores["experience"] = s
-    if s < 1:
-        missing_fields["experience"] = f"Required {required_exp}, has {company_exp}"
-    score += s * 0.2
-    total_weight += 0.2
-
-    # Documents similarity
-    docs_score, _, miss = compute_embedding_similarity_list(
-        eligibility.get("required_documents", []),
-        company.get("documents_provided", [])
+        return 0
+
+def _batch_similarity_lists(required_lists: list, provided_list: list, threshold: float = 0.75):
+    """
+    Score many requirement lists against one provided list.
+
+    Every distinct requirement across all lists goes through the cascade once; the
+    ambiguous ones are compared to the provided items in a single similarity matrix.
+    Returns per-list scores and missing items.
+    """
+    found = cascade_match([req for required in required_lists for req in required], provided_list, threshold)
+
+    scores, missing = [], []
+    for required in required_lists:
+        miss = [req for req in required if not found.get(req, False)]
+        scores.append(round((len(required) - len(miss)) / len(required), 2) if required else 1.0)
+        missing.append(miss)
+    return np.asarray(scores, dtype=np.float64), missing
+
+def _batch_text_similarity(texts: list, company_text: str) -> np.ndarray:
+    """Cosine similarity of each text to company_text (NaN where either is empty)"""
+    sims = np.full(len(texts), np.nan)
+    present = [i for i, text in enumerate(texts) if text]
+    if present and company_text:
+        unique_texts = list(dict.fromkeys(texts[i] for i in present))
+        text_sims = dict(zip(unique_texts, (embed_texts(unique_texts) @ embed_texts(company_text)).tolist()))
+        for i in present:
+            sims[i] = text_sims[texts[i]]
+    return sims
+
+def compute_tender_match_scores_batch(eligibilities: list, company: dict) -> list:
+    """
+    Score one company against many tenders' structured eligibility in a single pass.
+
+    The company side is embedded once, requirements of all tenders are stacked and
+    compared in one similarity matrix per field, and the weighted scores are computed
+    with array operations. Returns one result dict per eligibility, in order, shaped
+    like compute_tender_match_score.
+    """
+    eligibilities = [e if isinstance(e, dict) else {} for e in eligibilities]
+    n = len(eligibilities)
+    if n == 0:
+        return []
+
+    # PAN / GSTIN checks (weight 0.1 each, only when required)
+    has_pan = 1.0 if company.get("pan") else 0.0
+    has_gstin = 1.0 if company.get("gstin") else 0.0
+    pan_required = np.array([bool(_section(e, "pan").get("required")) for e in eligibilities])
+    gstin_required = np.array([bool(_section(e, "gstin").get("required")) for e in eligibilities])
+
+    # Experience check (safe null fallback, weight 0.2)
+    company_exp = _company_experience(company)
+    required_exp = []
+    for e in eligibilities:
+        try:
+            required_exp.append(float(_section(e, "experience").get("minimum_years") or 0))
+        except (TypeError, ValueError):
+            required_exp.append(0.0)
+    required_exp = np.asarray(required_exp)
+    safe_required = np.where(required_exp > 0, required_exp, 1)
+    exp_scores = np.where(
+        (company_exp >= required_exp) | (required_exp <= 0),
+        1.0,
+        np.round(company_exp / safe_required, 2)
+    )
+
+    # Documents and certifications similarity (weight 0.2 each)
+    docs_scores, docs_missing = _batch_similarity_lists(
+        [_as_list(e.get("required_documents", [])) for e in eligibilities],
+        _as_list(company.get("documents_provided", []))
     )
-    field_scores["documents"] = docs_score
-    if miss:
-        missing_fields["documents"] = miss
-    score += docs_score * 0.2
-    total_weight += 0.2
-
-    # Certifications similarity
-    certs_score, _, miss = compute_embedding_similarity_list(
-        eligibility.get("certifications", []),
-        company.get("certifications_provided", [])
+    certs_scores, certs_missing = _batch_similarity_lists(
+        [_as_list(e.get("certifications", [])) for e in eligibilities],
+        _as_list(company.get("certifications_provided", []))
     )
-    field_scores["certifications"] = certs_score
-    if miss:
-        missing_fields["certifications"] = miss
-    score += certs_score * 0.2
-    total_weight += 0.2
-
-    # Other criteria (if present)
-    other_text = " ".join(str(v) for v in eligibility.get("other_criteria", {}).values() if v)
-    company_text = company.get("product_service_description", "")
-    if other_text and company_text:
-        sim = util.cos_sim(
-            model.encode(other_text, convert_to_tensor=True),
-            model.encode(company_text, convert_to_tensor=True)
-        ).item()
-        s = round(min(max(sim, 0), 1), 2)
-        field_scores["other_criteria"] = s
-        if s < 0.7:
-            missing_fields["other_criteria"] = "Service description may not match"
-        score += s * 0.2
-        total_weight += 0.2
+
+    # Other criteria (weight 0.2, only when both texts are present)
+    other_texts = [" ".join(str(v) for v in _section(e, "other_criteria").values() if v) for e in eligibilities]
+    other_sims = _batch_text_similarity(other_texts, company.get("product_service_description", ""))
+    has_other = ~np.isnan(other_sims)
+    other_scores = np.round(np.clip(np.nan_to_num(other_sims), 0, 1), 2)
 
     # Final score calculation
-    final_score = round((score / total_weight) * 100, 2) if total_weight else 0
-    eligible = final_score >= 70 and not missing_fields
-    print(final_score)
-    return {
-        "matching_score": final_score,
-        "eligible": eligible,
-        "field_scores": field_scores,
-        "missing_fields": missing_fields
-    }
+    score = (
+        pan_required * has_pan * 0.1
+        + gstin_required * has_gstin * 0.1
+        + exp_scores * 0.2
+        + docs_scores * 0.2
+        + certs_scores * 0.2
+        + has_other * other_scores * 0.2
+    )
+    total_weight = pan_required * 0.1 + gstin_required * 0.1 + 0.6 + has_other * 0.2
+    final_scores = np.round(score / total_weight * 100, 2)
+
+    results = []
+    for i in range(n):
+        field_scores, missing_fields = {}, {}
+        if pan_required[i]:
+            field_scores["pan"] = int(has_pan)
+            if not has_pan:
+                missing_fields["pan"] = "Missing PAN"
+        if gstin_required[i]:
+            field_scores["gstin"] = int(has_gstin)
+            if not has_gstin:
+                missing_fields["gstin"] = "Missing GSTIN"
+
+        field_scores["experience"] = float(exp_scores[i]) if exp_scores[i] < 1 else 1
+        if exp_scores[i] < 1:
+            missing_fields["experience"] = f"Required {required_exp[i]:g}, has {company_exp}"
+
+        field_scores["documents"] = float(docs_scores[i])
+        if docs_missing[i]:
+            missing_fields["documents"] = docs_missing[i]
+
+        field_scores["certifications"] = float(certs_scores[i])
+        if certs_missing[i]:
+            missing_fields["certifications"] = certs_missing[i]
+
+        if has_other[i]:
+            field_scores["other_criteria"] = float(other_scores[i])
+            if other_scores[i] < 0.7:
+                missing_fields["other_criteria"] = "Service description may not match"
+
+        final_score = float(final_scores[i])
+        results.append({
+            "matching_score": final_score,
+            "eligible": final_score >= 70 and not missing_fields,
+            "field_scores": field_scores,
+            "missing_fields": missing_fields
+        })
+    return results
+
+def compute_tender_match_score(eligibility: dict, company: dict):
+    """Score one company against one tender's structured eligibility"""
+    return compute_tender_match_scores_batch([eligibility], company)[0]
@@ -0,0 +1,117 @@
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from core.database import db
+from services.document_fetcher import fetch_document, content_hash
+from services.summarizer import get_summary_service, SUMMARY_MODEL_NAME
+
+tenders = db.get_collection("filtered_tenders")
+# Summaries keyed by PDF content, shared by every tender that links the same document
+pdf_summaries = db.get_collection("pdf_summaries")
+
+
+def _summary_key(document_hash: str, model_name: str) -> str:
+    return f"{model_name}:{document_hash}"
+
+
+def cached_tender_summary(tender: dict, model_name: str = SUMMARY_MODEL_NAME) -> Optional[dict]:
+    """The summary stored on a tender, if it was made from its current form_url with this model"""
+    summary = tender.get("summary")
+    if summary and summary.get("form_url") == tender.get("form_url") and summary.get("model") == model_name:
+        return summary
+    return None
+
+
+def lookup_document_summary(document_hash: str, model_name: str = SUMMARY_MODEL_NAME) -> Optional[str]:
+    doc = pdf_summaries.find_one({"_id": _summary_key(document_hash, model_name)}, {"summary": 1})
+    return doc["summary"] if doc else None
+
+
+def store_summary(tender: dict, document_hash: str, summary_text: str, model_name: str = SUMMARY_MODEL_NAME) -> dict:
+    """
+    Persist a summary under its document hash and on the tender.
+
+    last_updated is left alone: a summary does not change what the tender matches.
+    """
+    now = datetime.utcnow()
+    summary = {
+        "text": summary_text,
+        "content_hash": document_hash,
+        "form_url": tender.get("form_url"),
+        "model": model_name,
+        "created_at": now
+    }
+    try:
+        pdf_summaries.update_one(
+            {"_id": _summary_key(document_hash, model_name)},
+            {"$set": {"content_hash": document_hash, "model": model_name, "summary": summary_text, "created_at": now}},
+            upsert=True
+        )
+        tenders.update_one({"_id": tender["_id"]}, {"$set": {"summary": summary}})
+    except PyMongoError as e:
+        print(f"⚠️ Could not store summary for tender {tender['_id']}: {str(e)}")
+    tender["summary"] = summary
+    return summary
+
+
+def get_tender_summary(tender: dict, api_key: str) -> dict:
+    """
+    Summary of a tender's PDF, computed at most once per document.
+
+    Served from the tender itself when present (no outbound call); otherwise the
+    PDF is downloaded into memory and looked up by content hash before Gemini is
+    asked. Returns {"text", "content_hash", "cached"}.
+    """
+    summary = cached_tender_summary(tender)
+    if summary:
+        return {"text": summary["text"], "content_hash": summary["content_hash"], "cached": True}
+
+    pdf_bytes = fetch_document(tender["form_url"])
+    document_hash = content_hash(pdf_bytes)
+
+    summary_text = lookup_document_summary(document_hash)
+    cached = summary_text is not None
+    if not cached:
+        summary_text = get_summary_service(api_key).summarize_pdf(pdf_bytes, document_hash=document_hash).strip()
+
+    if summary_text:
+        store_summary(tender, document_hash, summary_text)
+    return {"text": summary_text, "content_hash": document_hash, "cached": cached}
+
+
+def _stream_and_store(tender: dict, pdf_bytes: bytes, document_hash: str, api_key: str) -> Iterator[str]:
+    chunks = []
+    for chunk in get_summary_service(api_key).stream_summary_pdf(pdf_bytes, document_hash=document_hash):
+        chunks.append(chunk)
+        yield chunk
+    # Only a complete summary is cached: SummaryIncomplete (raised by the stream) and
+    # an early disconnect both skip this, and the caller reports the interruption
+    summary_text = "".join(chunks).strip()
+    if summary_text:
+        store_summary(tender, document_hash, summary_text)
+
+
+def stream_tender_summary(tender: dict, api_key: str) -> Tuple[Iterator[str], bool]:
+    """
+    Like get_tender_summary, but returns (chunks, cached) with chunks streamed from Gemini.
+
+    The cache lookup and the PDF download happen before returning, so download
+    errors surface to the caller rather than mid-stream. The full text is cached
+    once the stream is consumed, unless it came out incomplete: then the stream
+    raises SummaryIncomplete after its last chunk and nothing is stored.
+    """
+    summary = cached_tender_summary(tender)
+    if summary:
+        return iter([summary["text"]]), True
+
+    pdf_bytes = fetch_document(tender["form_url"])
+    document_hash = content_hash(pdf_bytes)
+
+    summary_text = lookup_document_summary(document_hash)
+    if summary_text is not None:
+        store_summary(tender, document_hash, summary_text)
+        return iter([summary_text]), True
+
+    return _stream_and_store(tender, pdf_bytes, document_hash, api_key), False
@@ -0,0 +1,110 @@
+import pytest
+
+from services.heading_matcher import is_heading_line, match_eligibility_heading, find_local_eligibility_section
+
+
+@pytest.mark.parametrize("line", [
+    "4. ELIGIBILITY CRITERIA",
+    "ELIGIBILITY CRITERIA",
+    "5. SCOPE OF WORK",
+    "4.2 Technical Qualification",
+    "Section 6 Terms And Conditions",
+    "II. INSTRUCTIONS TO BIDDERS",
+])
+def test_headings_are_recognised(line):
+    assert is_heading_line(line)
+
+
+@pytest.mark.parametrize("line", [
+    "GST",
+    "PAN",
+    "2 Years",
+    "10 Crore Turnover Required",
+    "Rs. 50 Lakhs",
+    "3 YEARS",
+    "- GST REGISTRATION CERTIFICATE",
+    "(a) Average Annual Turnover",
+    "The bidder shall submit the following documents.",
+])
+def test_quantities_list_items_and_prose_are_not_headings(line):
+    assert not is_heading_line(line)
+
+
+def _layout(lines):
+    return [{"content": line, "role": "sectionHeading" if is_heading_line(line) else None} for line in lines]
+
+
+def _section_lines(lines):
+    paragraphs = _layout(lines)
+    section = find_local_eligibility_section(paragraphs)
+    return [p["content"] for p in paragraphs[section.start:section.end]]
+
+
+PREAMBLE = (
+    "Bidders must meet all of the following criteria on the date of bid submission, and documentary "
+    "evidence for each criterion must be uploaded with the technical bid. Bids from firms that do not "
+    "meet these criteria will be rejected without further evaluation by the tender committee."
+)
+
+
+def test_numbered_sub_list_stays_in_the_section():
+    lines = [
+        "3. INSTRUCTIONS TO BIDDERS",
+        "Bids must be submitted online.",
+        "4. ELIGIBILITY CRITERIA",
+        PREAMBLE,
+        "1. Average Annual Turnover",
+        "10 Crore Turnover Required",
+        "2. Past Experience",
+        "2 Years",
+        "3. Registration",
+        "GST REGISTRATION CERTIFICATE",
+        "5. SCOPE OF WORK",
+        "Supply and installation of equipment.",
+    ]
+    assert _section_lines(lines) == lines[3:10]
+
+
+def test_nested_list_numbered_past_the_heading_does_not_end_it():
+    lines = ["4. ELIGIBILITY CRITERIA", PREAMBLE] + [f"{i}. Criterion Number {i}" for i in range(1, 8)] + [
+        "5. SCOPE OF WORK",
+        "Supply and installation of equipment.",
+    ]
+    assert _section_lines(lines) == lines[1:9]
+
+
+def test_sub_sections_end_at_the_next_sibling():
+    lines = [
+        "4. ELIGIBILITY CRITERIA",
+        "4.1 Financial Criteria",
+        "Turnover of at least Rs 10 crore.",
+        "4.2 Technical Criteria",
+        "Three similar works.",
+        "5. SCOPE OF WORK",
+    ]
+    assert _section_lines(lines) == lines[1:5]
+
+
+def test_unnumbered_heading_ends_at_the_next_unnumbered_heading():
+    lines = [
+        "ELIGIBILITY CRITERIA",
+        "1. Average Annual Turnover",
+        "2. Past Experience",
+        "SCOPE OF WORK",
+        "Supply and installation of equipment.",
+    ]
+    assert _section_lines(lines) == lines[1:3]
+
+
+@pytest.mark.parametrize("text, pattern", [
+    ("Minimum Eligibility Requirements", "minimum eligibility requirements"),
+    ("7. Pre-Qualification Criteria", "pre-qualification criteria"),
+    ("Bidder Eligibility Criteria", "bidder eligibility criteria"),
+    ("ELIGIBILITY", "eligibility"),
+])
+def test_overlapping_matches_pick_the_most_specific_pattern(text, pattern):
+    assert match_eligibility_heading(text).pattern == pattern
+
+
+def test_no_match_outside_eligibility_headings():
+    assert match_eligibility_heading("SCOPE OF WORK") is None
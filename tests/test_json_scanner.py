@@ -0,0 +1,54 @@
+import pytest
+
+from services.json_scanner import JsonObjectScanner, extract_first_json_object
+
+
+def _feed_in_pieces(text: str, size: int):
+    scanner = JsonObjectScanner()
+    for start in range(0, len(text), size):
+        parsed = scanner.feed(text[start:start + size])
+        if parsed is not None:
+            return parsed, len(scanner.text)
+    return None, len(scanner.text)
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_braces_and_escaped_quotes_inside_strings(size):
+    text = '{"note": "a } b { c", "quote": "say \\"}\\" now", "path": "C:\\\\dir\\\\"}'
+    parsed, _ = _feed_in_pieces(text, size)
+    assert parsed == {"note": "a } b { c", "quote": 'say "}" now', "path": "C:\\dir\\"}
+
+
+def test_prose_with_quotes_before_the_object():
+    text = 'Here is the "JSON" you asked for:\n```json\n{"gstin": {"required": true}}\n```'
+    parsed, _ = _feed_in_pieces(text, 4)
+    assert parsed == {"gstin": {"required": True}}
+
+
+def test_stops_at_the_first_complete_object():
+    text = '{"pan": {"required": false}}' + " trailing tokens" * 100
+    parsed, consumed = _feed_in_pieces(text, 5)
+    assert parsed == {"pan": {"required": False}}
+    assert consumed < 40
+
+
+def test_malformed_candidate_is_skipped():
+    parsed, _ = _feed_in_pieces('{"a": bad} then {"ok": true}', 2)
+    assert parsed == {"ok": True}
+
+
+def test_dropped_comma_is_repaired():
+    parsed, _ = _feed_in_pieces('{"experience": {"required": true}\n"gstin": {"required": false}}', 7)
+    assert parsed == {"experience": {"required": True}, "gstin": {"required": False}}
+
+
+def test_truncated_object_yields_nothing():
+    parsed, _ = _feed_in_pieces('{"experience": {"required": tr', 3)
+    assert parsed is None
+
+
+def test_extract_first_json_object():
+    assert extract_first_json_object('```json\n{"a": 1}\n```') == {"a": 1}
+    assert extract_first_json_object('Sure: {"a": {"b": [1, 2]}} and {"c": 3}') == {"a": {"b": [1, 2]}}
+    assert extract_first_json_object("no json here") == {}
+    assert extract_first_json_object('{"a": {"trunc') == {}
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.llm_client import ZephyrClient, AsyncZephyrClient, LLMRequestError
+
+
+class StandIn:
+    """
+    Local stand-in for the Zephyr endpoint. The path picks the behaviour:
+    /echo answers after a short delay, /flaky fails its first `failures`
+    requests with 503, /hang sleeps past the client's read timeout and /bad
+    answers 400. /stream/<format> sends `tokens` one at a time as SSE, NDJSON
+    or plain text, or all at once in the {"response"} envelope labelled as
+    JSON or as plain text.
+    """
+
+    def __init__(self, latency: float = 0.05, failures: int = 0, hang_seconds: float = 1.0,
+                 tokens: tuple = (), token_seconds: float = 0.0):
+        self.latency = latency
+        self.failures = failures
+        self.hang_seconds = hang_seconds
+        self.tokens = tokens
+        self.token_seconds = token_seconds
+        self.tokens_sent = 0
+        self.disconnected = threading.Event()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def _handler(self):
+        state = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict = None, content_type: str = "application/json"):
+                payload = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("content-type", content_type)
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, fmt: str):
+                if fmt in ("envelope-json", "envelope-plain"):
+                    content_type = "application/json" if fmt == "envelope-json" else "text/plain"
+                    self._send(200, {"response": "".join(state.tokens)}, content_type)
+                    return
+                content_type = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}.get(fmt, "text/plain")
+                self.send_response(200)
+                self.send_header("content-type", content_type)
+                self.end_headers()
+                try:
+                    for token in state.tokens:
+                        if fmt == "sse":
+                            frame = f"data: {json.dumps({'token': token})}\n\n"
+                        elif fmt == "ndjson":
+                            frame = json.dumps({"response": token}) + "\n"
+                        else:
+                            frame = token
+                        self.wfile.write(frame.encode())
+                        self.wfile.flush()
+                        state.tokens_sent += 1
+                        time.sleep(state.token_seconds)
+                except (BrokenPipeError, ConnectionResetError):
+                    state.disconnected.set()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+                if self.path.startswith("/stream/"):
+                    self._stream(self.path.rsplit("/", 1)[1])
+                    return
+                with state.lock:
+                    state.requests += 1
+                    attempt = state.requests
+                    state.in_flight += 1
+                    state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                try:
+                    if self.path == "/hang":
+                        time.sleep(state.hang_seconds)
+                        return
+                    time.sleep(state.latency)
+                finally:
+                    # Leave the in-flight count before answering, so a client reusing its slot is not double counted
+                    with state.lock:
+                        state.in_flight -= 1
+                try:
+                    if self.path == "/bad":
+                        self._send(400, {"detail": "bad prompt"})
+                    elif self.path == "/flaky" and attempt <= state.failures:
+                        self._send(503)
+                    else:
+                        self._send(200, {"response": f"echo:{body['prompt']}"})
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+
+
+def _settings(url: str, concurrency: int = 2, max_retries: int = 2) -> dict:
+    return {
+        "url": url,
+        "connect_timeout": 1.0,
+        "read_timeout": 0.3,
+        "max_retries": max_retries,
+        "backoff": 0.01,
+        "concurrency": concurrency
+    }
+
+
+def test_complete_returns_response_text():
+    with StandIn() as server:
+        client = ZephyrClient(**_settings(server.url("/echo")))
+        assert client.complete("hello") == "echo:hello"
+        client.close()
+
+
+def test_concurrency_limit_is_respected():
+    with StandIn(latency=0.05) as server:
+        client = ZephyrClient(**_settings(server.url("/echo"), concurrency=3))
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            results = list(pool.map(lambda i: client.complete(f"p{i}"), range(24)))
+        client.close()
+
+    assert results == [f"echo:p{i}" for i in range(24)]
+    assert server.max_in_flight <= 3
+
+
+def test_retryable_status_is_retried():
+    with StandIn(failures=2) as server:
+        client = ZephyrClient(**_settings(server.url("/flaky"), max_retries=2))
+        assert client.complete("hello") == "echo:hello"
+        client.close()
+    assert server.requests == 3
+
+
+def test_gives_up_after_max_retries():
+    with StandIn(failures=10) as server:
+        client = ZephyrClient(**_settings(server.url("/flaky"), max_retries=2))
+        with pytest.raises(LLMRequestError):
+            client.complete("hello")
+        client.close()
+    assert server.requests == 3
+
+
+def test_read_timeout_is_retried_then_raised():
+    with StandIn(hang_seconds=1.0) as server:
+        client = ZephyrClient(**_settings(server.url("/hang"), max_retries=1))
+        started = time.perf_counter()
+        with pytest.raises(LLMRequestError):
+            client.complete("hello")
+        elapsed = time.perf_counter() - started
+        client.close()
+    assert server.requests == 2
+    assert elapsed < 1.0
+
+
+def test_client_errors_are_not_retried():
+    with StandIn() as server:
+        client = ZephyrClient(**_settings(server.url("/bad")))
+        with pytest.raises(LLMRequestError):
+            client.complete("hello")
+        client.close()
+    assert server.requests == 1
+
+
+def test_async_client_respects_limit_and_retries():
+    async def run(url: str):
+        client = AsyncZephyrClient(**_settings(url, concurrency=2, max_retries=3))
+        try:
+            return await asyncio.gather(*(client.complete(f"p{i}") for i in range(10)))
+        finally:
+            await client.aclose()
+
+    with StandIn(failures=3) as server:
+        results = asyncio.run(run(server.url("/flaky")))
+
+    assert results == [f"echo:p{i}" for i in range(10)]
+    assert server.max_in_flight <= 2
+    assert server.requests == 13
+
+
+def test_async_client_gives_up_on_timeouts():
+    async def run(url: str):
+        client = AsyncZephyrClient(**_settings(url, max_retries=1))
+        try:
+            await client.complete("hello")
+        finally:
+            await client.aclose()
+
+    with StandIn(hang_seconds=1.0) as server:
+        with pytest.raises(LLMRequestError):
+            asyncio.run(run(server.url("/hang")))
+    assert server.requests == 2
+
+
+TOKENS = ('{"gstin": ', '{"required": true}', ', "note": "a } b"}', " and more", " tokens")
+
+
+@pytest.mark.parametrize("fmt", ["sse", "ndjson", "text", "envelope-json", "envelope-plain"])
+def test_stream_yields_generated_text_for_every_response_format(fmt):
+    with StandIn(tokens=TOKENS) as server:
+        client = ZephyrClient(**_settings(server.url(f"/stream/{fmt}")))
+        text = "".join(client.stream_complete("hello"))
+        client.close()
+    assert text == "".join(TOKENS)
+
+
+def test_plain_text_body_starting_with_an_object_is_not_unwrapped():
+    with StandIn(tokens=('{"experience": ', '{"required": false}}')) as server:
+        client = ZephyrClient(**_settings(server.url("/stream/text")))
+        text = "".join(client.stream_complete("hello"))
+        client.close()
+    assert text == '{"experience": {"required": false}}'
+
+
+def test_closing_the_stream_stops_generation():
+    tokens = tuple(f"tok{i} " for i in range(200))
+    with StandIn(tokens=tokens, token_seconds=0.01) as server:
+        client = ZephyrClient(**_settings(server.url("/stream/sse"), max_retries=0))
+        chunks = client.stream_complete("hello")
+        received = [chunk for _, chunk in zip(range(20), chunks)]
+        chunks.close()
+        client.close()
+        assert server.disconnected.wait(timeout=2)
+    assert received == list(tokens[:20])
+    assert server.tokens_sent < len(tokens)
+
+
+def test_async_stream_unwraps_an_unlabelled_envelope():
+    async def run(url: str):
+        client = AsyncZephyrClient(**_settings(url))
+        try:
+            return "".join([chunk async for chunk in client.stream_complete("hello")])
+        finally:
+            await client.aclose()
+
+    with StandIn(tokens=TOKENS) as server:
+        text = asyncio.run(run(server.url("/stream/envelope-plain")))
+    assert text == "".join(TOKENS)
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import numpy as np
+
+from services.tender_index import TenderIndex
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_repeated_upserts_do_not_grow_storage():
+    index = TenderIndex()
+    vectors = {"category": [_unit([1, 0, 0]), _unit([0, 1, 0])], "scope": [_unit([0, 0, 1])]}
+    for _ in range(100):
+        index.upsert("t1", vectors)
+
+    assert index.live_count() == 3
+    assert index.size <= 2 * index.live_count()
+    assert index.tender_count() == 1
+
+
+def test_search_after_compaction_returns_current_rows():
+    index = TenderIndex()
+    index.upsert("t1", {"category": [_unit([1, 0, 0])]})
+    index.upsert("t2", {"category": [_unit([0, 1, 0])]})
+    for _ in range(10):
+        index.upsert("t1", {"category": [_unit([0, 0, 1])]})
+
+    hits = index.search(_unit([0, 0, 1]), k=5)[0]
+    assert [(tender_id, kind) for tender_id, kind, _ in hits[:1]] == [("t1", "category")]
+    assert {tender_id for tender_id, _, _ in hits} == {"t1", "t2"}
+
+
+def test_remove_then_reload_keeps_live_count(tmp_path):
+    index = TenderIndex()
+    index.upsert("t1", {"category": [_unit([1, 0])]})
+    index.upsert("t2", {"category": [_unit([0, 1])]})
+    index.remove("t1")
+
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = TenderIndex.load(path)
+    assert loaded.live_count() == 1
+    assert loaded.indexed_tender_ids() == ["t2"]
+
+
+def test_save_does_not_overwrite_a_later_sync(tmp_path):
+    path = str(tmp_path / "index.npz")
+    current = TenderIndex()
+    current.upsert("t2", {"category": [_unit([0, 1])]})
+    current.watermark = datetime(2024, 1, 1)
+    current.deletion_watermark = datetime(2024, 1, 2)
+    current.save(path)
+
+    stale = TenderIndex()
+    stale.upsert("t1", {"category": [_unit([1, 0])]})
+    stale.upsert("t2", {"category": [_unit([0, 1])]})
+    stale.watermark = datetime(2024, 1, 1)
+    stale.deletion_watermark = datetime(2024, 1, 1)
+    stale.save(path)
+
+    loaded = TenderIndex.load(path)
+    assert loaded.indexed_tender_ids() == ["t2"]
+    assert loaded.deletion_watermark == datetime(2024, 1, 2)
+    assert stale.dirty
+
+    stale.remove("t1")
+    stale.deletion_watermark = datetime(2024, 1, 2)
+    stale.save(path)
+    assert not stale.dirty
@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from services.tender_matcher import _lexical_match, _normalize_item
+
+
+def _matches(required: str, provided: list) -> bool:
+    return _lexical_match(_normalize_item(required), [_normalize_item(p) for p in provided])
+
+
+@pytest.mark.parametrize("required, provided", [
+    ("ISO 9001 certificate", "ISO 14001 certificate"),
+    ("Class A license", "Class B license"),
+    ("GSTR-3B returns", "GSTR-1 returns"),
+])
+def test_different_identifiers_are_not_settled_lexically(required, provided):
+    assert not _matches(required, [provided])
+
+
+@pytest.mark.parametrize("required, provided", [
+    ("ISO 9001 certificate", "ISO 9001 Certificate."),
+    ("Class A license", "class-a licence"),
+    ("PAN card copy", "Copy of PAN card"),
+])
+def test_near_identical_items_match_lexically(required, provided):
+    assert _matches(required, [provided])
+
+
+def test_later_candidate_with_same_identifiers_is_found():
+    assert _matches("ISO 9001 certificate", ["ISO 14001 certificate", "ISO 9001 certificates"])
+
+
+def test_length_guard_rejects_generic_subset():
+    assert not _matches("Certificate", ["GST Certificate"])